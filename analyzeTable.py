@@ -1,77 +1,193 @@
+import sys
+
 import data
+import instrument
 import lrStateSet
 
-action_table = []  # list of maps
-goto_table = []  # list of maps
+EXPLICIT_ERROR = 'err'  # a cell made an error by %nonassoc, unlike an empty cell 0 no default reduction may fill it
+
+
+class AnalyzeTable:
+    """
+    the ACTION and GOTO tables of the states of a StateSet, the functions below work on the default instance unless
+    given one, the module-level names, analyzeTable.action_table and so on, are the attributes of the default instance
+    """
+    def __init__(self, state_set: lrStateSet.StateSet = None):
+        self.state_set = state_set or lrStateSet.default
+        self.action_table = []  # list of maps
+        self.goto_table = []  # list of maps
+        self.conflicts = []  # (state id, terminal, actions, kept action, reason) of every collision in action_table
+
+
+default = AnalyzeTable()
+
+
+def __getattr__(name):
+    return getattr(default, name)
 
 
-def initializeActionTable() -> None:
-    for i in range(lrStateSet.length):
+def initializeActionTable(table: AnalyzeTable = None) -> None:
+    table = table or default
+    grammar = table.state_set.grammar
+    for i in range(table.state_set.length):
         d = dict()
-        for terminal in data.terminals:
+        for terminal in grammar.terminals:
             if terminal == data.EPS:
                 continue
             d[terminal] = 0
         d[data.END] = 0
-        action_table.append(d)
+        table.action_table.append(d)
 
 
-def initializeGotoTable() -> None:
-    for i in range(lrStateSet.length):
+def initializeGotoTable(table: AnalyzeTable = None) -> None:
+    table = table or default
+    grammar = table.state_set.grammar
+    for i in range(table.state_set.length):
         d = dict()
-        for n_terminal in data.n_terminals:
+        for n_terminal in grammar.n_terminals:
             d[n_terminal] = 0
-        goto_table.append(d)
+        table.goto_table.append(d)
+
+
+def initializeTable(table: AnalyzeTable = None) -> None:
+    table = table or default
+    table.action_table.clear()
+    table.goto_table.clear()
+    initializeActionTable(table)
+    initializeGotoTable(table)
+
+
+def reduceId(action: str) -> int:
+    return 0 if action == 'acc' else int(action[1:])
+
+
+def resolve(state_id: int, terminal: str, old: str, new: str, table: AnalyzeTable = None):
+    """
+    choose the action of action_table[state_id][terminal] when old is already there, like yacc:
+    reduce/reduce: the production rule listed first
+    shift/reduce: by the precedence of the terminal and of the production rule, then by associativity,
+    shift if one of them has no precedence
+    every collision is recorded in conflicts
+    """
+    table = table or default
+    grammar = table.state_set.grammar
+    precedence = grammar.precedence
+    conflicts = table.conflicts
+    if old[0] != 's' and new[0] != 's':
+        kept = old if reduceId(old) < reduceId(new) else new
+        conflicts.append((state_id, terminal, [old, new], kept, 'reduce/reduce: first production rule'))
+        return kept
+    shift, reduce = (old, new) if old[0] == 's' else (new, old)
+    level = data.productionPrecedence(grammar.production_rule_list[reduceId(reduce)], grammar)
+    if terminal not in precedence or level is None:
+        kept, reason = shift, 'shift/reduce: no precedence, shift'
+    elif level > precedence[terminal][0]:
+        kept, reason = reduce, 'shift/reduce: precedence'
+    elif level < precedence[terminal][0]:
+        kept, reason = shift, 'shift/reduce: precedence'
+    elif precedence[terminal][1] == 'left':
+        kept, reason = reduce, 'shift/reduce: left associative'
+    elif precedence[terminal][1] == 'right':
+        kept, reason = shift, 'shift/reduce: right associative'
+    else:
+        kept, reason = EXPLICIT_ERROR, 'shift/reduce: nonassociative, error'
+    conflicts.append((state_id, terminal, [old, new], kept, reason))
+    return kept
 
 
-def initializeTable() -> None:
-    initializeActionTable()
-    initializeGotoTable()
+def setAction(state_id: int, terminal: str, action: str, table: AnalyzeTable = None) -> None:
+    action_table = (table or default).action_table
+    old = action_table[state_id][terminal]
+    if old == EXPLICIT_ERROR:
+        return
+    if old == 0 or old == action:
+        action_table[state_id][terminal] = action
+    else:
+        action_table[state_id][terminal] = resolve(state_id, terminal, old, action, table)
 
 
-def generateAnalyzeTable() -> None:
-    initializeTable()
-    for state in lrStateSet.state_set:
-        for lr_project in state.lr_projects:
-            if lr_project.reduce:
-                if lr_project.production_rule_id == 0:
-                    action_table[state.id][lr_project.look_forward] = 'acc'
+def unresolvedConflicts(table: AnalyzeTable = None) -> list:
+    """
+    the conflicts that were not settled by a precedence or associativity declaration
+    """
+    return [conflict for conflict in (table or default).conflicts
+            if 'no precedence' in conflict[4] or 'reduce/reduce' in conflict[4]]
+
+
+def showConflicts(file=sys.stderr, table: AnalyzeTable = None) -> None:
+    conflicts = (table or default).conflicts
+    for state_id, terminal, actions, kept, reason in conflicts:
+        print('I%d %s: %s -> %s (%s)' % (state_id, terminal, ' / '.join(actions), kept, reason), file=file)
+    print('%d conflicts, %d not resolved by precedence' % (len(conflicts), len(unresolvedConflicts(table))), file=file)
+
+
+@instrument.timed('generateAnalyzeTable')
+def generateAnalyzeTable(table: AnalyzeTable = None) -> None:
+    table = table or default
+    lr = table.state_set
+    grammar = lr.grammar
+    project_by_core = lr.project_by_core
+    initializeTable(table)
+    table.conflicts.clear()
+    for state in lr.state_set:
+        for production_rule_id, dot, look_forward in state.items:
+            if project_by_core[(production_rule_id, dot)].reduce:
+                if production_rule_id == 0:
+                    setAction(state.id, grammar.symbol_names[look_forward], 'acc', table)
                 else:
-                    action_table[state.id][lr_project.look_forward] = 'r' + str(lr_project.production_rule_id)
+                    setAction(state.id, grammar.symbol_names[look_forward], 'r' + str(production_rule_id), table)
         for symbol in state.goto:
-            if symbol in data.terminals:
+            if symbol in grammar.terminal_set:
                 if symbol == data.EPS:
                     continue
-                action_table[state.id][symbol] = 's' + str(state.goto[symbol])
-            elif symbol in data.n_terminals:
-                goto_table[state.id][symbol] = state.goto[symbol]
-
-
-def showAnalyzeTable() -> None:
-    print('I', end=' ')
-    for terminal in data.terminals:
-        if terminal == data.EPS:
-            continue
-        print(terminal, end=' ')
-    print(data.END, end=' ')
-    for n_terminal in data.n_terminals:
-        print(n_terminal, end=' ')
-    print()
-    for i in range(lrStateSet.length):
-        print(i, end=' ')
-        for terminal in data.terminals:
-            if terminal == data.EPS:
-                continue
-            print(action_table[i][terminal], end=' ')
-        print(action_table[i][data.END], end=' ')
-        for n_terminal in data.n_terminals:
-            print(goto_table[i][n_terminal], end=' ')
-        print()
+                setAction(state.id, symbol, 's' + str(state.goto[symbol]), table)
+            elif symbol in grammar.n_terminal_set:
+                table.goto_table[state.id][symbol] = state.goto[symbol]
+
+
+def tableColumns(grammar: data.Grammar = None) -> tuple:
+    """
+    :return: (terminal columns ending with END, nonterminal columns), in the order of the data files
+    """
+    grammar = grammar or data.default
+    return [terminal for terminal in grammar.terminals if terminal != data.EPS] + [data.END], list(grammar.n_terminals)
+
+
+def tableRows(table: AnalyzeTable = None) -> list:
+    """
+    the cells of the table as strings, the first row is the header
+    """
+    table = table or default
+    action_table = table.action_table
+    goto_table = table.goto_table
+    terminals, n_terminals = tableColumns(table.state_set.grammar)
+    res = [['I'] + terminals + n_terminals]
+    for i in range(len(action_table)):
+        action_row = action_table[i]
+        goto_row = goto_table[i]
+        res.append([str(i)] + [str(action_row[terminal]) for terminal in terminals] +
+                   [str(goto_row[n_terminal]) for n_terminal in n_terminals])
+    return res
+
+
+def showAnalyzeTable(file=None, table: AnalyzeTable = None) -> None:
+    file = file or sys.stdout
+    file.write(''.join(' '.join(row) + ' \n' for row in tableRows(table)))
 
 
 if __name__ == '__main__':
-    data.readData()
-    lrStateSet.generateLRStateSet()
-    # lrStateSet.showStates()
-    generateAnalyzeTable()
-    showAnalyzeTable()
+    # the build goes through tableBuilder, which keeps the grammar and the tables in its own objects
+    import tableBuilder
+
+    processes = 1
+    if '-j' in sys.argv[1:]:  # -j N: build the LR(1) states with N processes
+        processes = int(sys.argv[sys.argv.index('-j') + 1])
+    grammar = tableBuilder.Grammar(prune='prune' in sys.argv[1:])  # prune: remove the useless production rules first
+    builder = tableBuilder.TableBuilder(grammar, 'lalr' if 'lalr' in sys.argv[1:] else 'lr1', processes)
+    builder.build()
+    if '-o' in sys.argv[1:]:  # -o FILE: write the table to FILE, the format is chosen by its extension
+        builder.writeTable(sys.argv[sys.argv.index('-o') + 1])
+    else:
+        builder.showAnalyzeTable()
+    if len(builder.conflicts) > 0:
+        builder.showConflicts()
@@ -0,0 +1,85 @@
+import os
+import sys
+import tempfile
+import time
+from array import array
+from multiprocessing import Pool
+from multiprocessing import shared_memory
+
+import lrParser
+import tableCache
+
+shared = None  # SharedMemory holding the tables, attached in every worker
+
+
+def shareTables() -> shared_memory.SharedMemory:
+    """
+    copy the tables of lrParser into a new shared memory block once, in the layout of tableCache
+    """
+    buffer = tableCache.tablesToBytes()
+    block = shared_memory.SharedMemory(create=True, size=len(buffer))
+    block.buf[:len(buffer)] = buffer
+    return block
+
+
+def attachTables(name: str) -> None:
+    """
+    initializer of a worker: point the tables of lrParser at the shared block, nothing is copied or rebuilt
+    """
+    global shared
+    shared = shared_memory.SharedMemory(name=name)
+    tableCache.loadBuffer(shared.buf)
+
+
+def parseFile(path: str) -> tuple:
+    """
+    parse a file of terminal names separated by white space
+    :return: (path, reductions as array of production rule ids, None) or (path, None, error message)
+    """
+    try:
+        with open(path) as f:
+            tokens = lrParser.tokenIds(f.read().split())
+        return path, array('i', lrParser.parse(tokens)), None
+    except (OSError, KeyError, SyntaxError) as e:
+        return path, None, '%s: %s' % (type(e).__name__, e)
+
+
+def batchParse(paths: list, processes: int = None, chunksize: int = 1):
+    """
+    parse paths with a pool of processes sharing the tables currently in lrParser
+    :return: iterator of the results of parseFile, in the order of paths
+    """
+    block = shareTables()
+    try:
+        with Pool(processes, initializer=attachTables, initargs=(block.name,)) as pool:
+            yield from pool.imap(parseFile, paths, chunksize)
+    finally:
+        block.close()
+        block.unlink()
+
+
+if __name__ == '__main__':
+    tableCache.loadOrBuild('lalr' if 'lalr' in sys.argv[1:] else 'lr1')
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for i in range(64):
+            path = os.path.join(directory, '%d.txt' % i)
+            with open(path, 'w') as f:
+                f.write(' '.join(lrParser.sampleProgram(2000 + i)))
+            paths.append(path)
+        with open(os.path.join(directory, 'wrong.txt'), 'w') as f:
+            f.write('int ID ;')
+        paths.insert(1, os.path.join(directory, 'wrong.txt'))
+
+        tokens = sum(len(lrParser.sampleProgram(2000 + i)) for i in range(64))
+        start = time.perf_counter()
+        expected = [parseFile(path)[1] for path in paths]
+        single = time.perf_counter() - start
+        print('1 process without pool: %.0f tokens per second' % (tokens / single))
+        for processes in sorted({1, 2, 4, os.cpu_count() or 1}):
+            start = time.perf_counter()
+            results = list(batchParse(paths, processes))
+            seconds = time.perf_counter() - start
+            assert [reductions for path, reductions, error in results] == expected
+            print('%d processes: %.0f tokens per second  speedup %.2f' % (processes, tokens / seconds, single / seconds))
+        print('errors: %s' % [error for path, reductions, error in results if error is not None])
@@ -0,0 +1,179 @@
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import analyzeTable
+import data
+import grammarGenerator
+import lalrStateSet
+import lrParser
+import lrStateSet
+
+PHASES = ['readData', 'generateFirst', 'generateLRProjects', 'items', 'generateAnalyzeTable', 'lalr items']
+
+
+def suite() -> list:
+    """
+    (name, grammar or None for the bundled grammar, parameters) of every benchmark
+    """
+    res = [('bundled', None, {}),
+           ('expression', grammarGenerator.expressionGrammar(), {}),
+           ('statement', grammarGenerator.statementGrammar(), {})]
+    synthetic = [
+        dict(n_terminals=8, n_n_terminals=10, alternatives=3, rhs_length=3, epsilon=0.1, recursion='mixed'),
+        dict(n_terminals=12, n_n_terminals=20, alternatives=3, rhs_length=4, epsilon=0.1, recursion='mixed'),
+        dict(n_terminals=16, n_n_terminals=40, alternatives=3, rhs_length=4, epsilon=0.1, recursion='mixed'),
+        dict(n_terminals=12, n_n_terminals=20, alternatives=4, rhs_length=4, epsilon=0.3, recursion='none'),
+        dict(n_terminals=12, n_n_terminals=20, alternatives=3, rhs_length=4, epsilon=0.1, recursion='left'),
+        dict(n_terminals=12, n_n_terminals=20, alternatives=3, rhs_length=4, epsilon=0.1, recursion='right'),
+    ]
+    for parameters in synthetic:
+        name = 'synthetic-%(n_n_terminals)dn-%(alternatives)da-%(rhs_length)dl-%(recursion)s' % parameters
+        res.append((name, grammarGenerator.syntheticGrammar(**parameters), parameters))
+    return res
+
+
+def runPipeline(files: tuple) -> dict:
+    """
+    run every phase once
+    :return: phase -> seconds
+    """
+    res = dict()
+    start = time.perf_counter()
+    data.readSymbols(files[0], files[1])
+    data.readProductionRules(files[2])
+    if len(files) > 3:
+        data.readPrecedence(files[3])
+    res['readData'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    lrStateSet.generateFirst()
+    res['generateFirst'] = time.perf_counter() - start
+    start = time.perf_counter()
+    lrStateSet.generateLRProjects()
+    res['generateLRProjects'] = time.perf_counter() - start
+    start = time.perf_counter()
+    lrStateSet.items()
+    lrStateSet.default.length = len(lrStateSet.state_set)
+    res['items'] = time.perf_counter() - start
+    start = time.perf_counter()
+    analyzeTable.generateAnalyzeTable()
+    res['generateAnalyzeTable'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    lalrStateSet.items()
+    res['lalr items'] = time.perf_counter() - start
+    return res
+
+
+def measure(files: tuple, repeat: int = 3) -> dict:
+    """
+    the best time of every phase over repeat runs, then the peak memory of one more run under tracemalloc
+    """
+    seconds = dict()
+    for _ in range(repeat):
+        for phase, t in runPipeline(files).items():
+            seconds[phase] = min(seconds.get(phase, t), t)
+    res = {
+        'seconds': seconds,
+        'production rules': len(data.production_rule_list),
+        'projects': len(lrStateSet.lr_projects),
+        # length is set by the timed LR(1) phase, the LALR(1) phase after it only replaces state_set
+        'states': lrStateSet.length,
+        'lalr states': len(lrStateSet.state_set),
+    }
+    tracemalloc.start()
+    runPipeline(files)
+    res['peak memory'] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return res
+
+
+def precedenceBenchmark(directory: str, statements: int = 1000) -> dict:
+    """
+    the bundled grammar with factored expressions against the ambiguous one settled by precedence declarations:
+    states, conflicts and the number of reductions to parse the same program
+    """
+    res = dict()
+    forms = [('factored', ('./data/terminals.txt', './data/n_terminals.txt', './data/production_rules.txt')),
+             ('ambiguous', grammarGenerator.writeGrammar(os.path.join(directory, 'ambiguous'),
+                                                         grammarGenerator.ambiguousGrammar(),
+                                                         grammarGenerator.arithmeticPrecedence()))]
+    program = lrParser.sampleProgram(statements)
+    for name, files in forms:
+        runPipeline(files)
+        lalr_states = len(lrStateSet.state_set)
+        lrStateSet.items()
+        lrStateSet.default.length = len(lrStateSet.state_set)
+        analyzeTable.generateAnalyzeTable()
+        lrParser.encodeTables()
+        tokens = lrParser.tokenIds(program)
+        start = time.perf_counter()
+        reductions = lrParser.parse(tokens)
+        res[name] = {
+            'production rules': len(data.production_rule_list),
+            'states': lrStateSet.length,
+            'lalr states': lalr_states,
+            'conflicts': len(analyzeTable.conflicts),
+            'unresolved conflicts': len(analyzeTable.unresolvedConflicts()),
+            'tokens': len(tokens),
+            'reductions': len(reductions),
+            'parse seconds': time.perf_counter() - start,
+        }
+        print('%-45s %6d rules %6d states %6d lalr states %6d conflicts %8d reductions' % (
+            'precedence-' + name, res[name]['production rules'], res[name]['states'], lalr_states,
+            res[name]['conflicts'], res[name]['reductions']))
+    return res
+
+
+def run(repeat: int = 3) -> dict:
+    results = {'python': platform.python_version(), 'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'grammars': {}}
+    with tempfile.TemporaryDirectory() as directory:
+        for name, grammar, parameters in suite():
+            if grammar is None:
+                files = ('./data/terminals.txt', './data/n_terminals.txt', './data/production_rules.txt')
+            else:
+                files = grammarGenerator.writeGrammar(os.path.join(directory, name), grammar)
+            result = measure(files, repeat)
+            result['parameters'] = parameters
+            results['grammars'][name] = result
+            print('%-45s %6d rules %6d states %6d lalr states %8.3fs %8.1f KiB' % (
+                name, result['production rules'], result['states'], result['lalr states'],
+                sum(result['seconds'].values()), result['peak memory'] / 1024))
+        results['precedence'] = precedenceBenchmark(directory)
+    return results
+
+
+def compare(old: dict, new: dict) -> None:
+    """
+    print new time / old time of every phase of the grammars in both results, > 1 is slower
+    """
+    print('%-45s %s' % ('grammar', ' '.join('%12s' % phase[:12] for phase in PHASES + ['peak memory'])))
+    for name in new['grammars']:
+        if name not in old['grammars']:
+            continue
+        a = old['grammars'][name]
+        b = new['grammars'][name]
+        ratios = []
+        for phase in PHASES:
+            if phase in a['seconds'] and a['seconds'][phase] > 0:
+                ratios.append('%12.2f' % (b['seconds'][phase] / a['seconds'][phase]))
+            else:
+                ratios.append('%12s' % '-')
+        ratios.append('%12.2f' % (b['peak memory'] / a['peak memory']))
+        print('%-45s %s' % (name, ' '.join(ratios)))
+
+
+if __name__ == '__main__':
+    # python ./benchmark.py [result.json [previous result.json]]
+    output = sys.argv[1] if len(sys.argv) > 1 else 'benchmark.json'
+    results = run()
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    if len(sys.argv) > 2:
+        with open(sys.argv[2]) as f:
+            compare(json.load(f), results)
@@ -0,0 +1,216 @@
+import sys
+import time
+from array import array
+
+import analyzeTable
+import data
+import lalrStateSet
+import lrParser
+import lrStateSet
+
+
+class CompressedTables:
+    """
+    the tables of an lrParser.EncodedTables compressed, the functions below work on the default instance unless given
+    one, the module-level names, compressTable.action_row and so on, are the attributes of the default instance
+    """
+    def __init__(self, encoded: lrParser.EncodedTables = None):
+        self.encoded = encoded or lrParser.default
+        # ACTION: every state points to a row, states with identical rows share one
+        # a row keeps a default action, and its other entries are packed into action_value by row displacement:
+        # the entry of column c is action_value[action_base[row] + c] if action_check[action_base[row] + c] == row
+        self.action_row = array('i')  # state -> row
+        self.action_default = array('i')  # row -> encoded action used when the row has no entry for a terminal
+        self.action_base = array('i')  # row -> offset of the row in action_value
+        self.action_value = array('i')
+        self.action_check = array('i')  # row owning the slot, -1 if the slot is free
+        # GOTO: packed the same way with one row per nonterminal, indexed by state
+        self.goto_default = array('i')  # nonterminal -> most common target state
+        self.goto_base = array('i')
+        self.goto_value = array('i')
+        self.goto_check = array('i')
+
+
+default = CompressedTables()
+
+
+def __getattr__(name):
+    return getattr(default, name)
+
+
+def mostCommon(values: list) -> int:
+    count = dict()
+    for value in values:
+        count[value] = count.get(value, 0) + 1
+    res = 0
+    for value in count:
+        if res == 0 or count[value] > count[res]:
+            res = value
+    return res
+
+
+def pack(rows: list) -> tuple:
+    """
+    row displacement: every row is placed at the first offset where its entries only fall on free slots
+    :param rows: list of dict column -> value
+    :return: (base, value, check)
+    """
+    base = array('i', [0] * len(rows))
+    value = array('i')
+    check = array('i')
+    # dense rows are the hardest to place, put them first
+    for row_id in sorted(range(len(rows)), key=lambda r: -len(rows[r])):
+        row = rows[row_id]
+        if len(row) == 0:
+            continue
+        columns = sorted(row)
+        offset = -columns[0]
+        while True:
+            fit = True
+            for column in columns:
+                i = offset + column
+                if i < len(check) and check[i] != -1:
+                    fit = False
+                    break
+            if fit:
+                break
+            offset += 1
+        last = offset + columns[-1]
+        if last >= len(check):
+            value.extend([0] * (last + 1 - len(check)))
+            check.extend([-1] * (last + 1 - len(check)))
+        for column in columns:
+            value[offset + column] = row[column]
+            check[offset + column] = row_id
+        base[row_id] = offset
+    return base, value, check
+
+
+def compressActionTable(compressed: CompressedTables = None) -> None:
+    """
+    compress the action of compressed.encoded with default reductions, identical row sharing and row displacement
+    the default action of a row is its most common reduction, it also replaces the error entries of the row,
+    so on a wrong token a few reductions may happen before the error is found, but never a shift
+    """
+    compressed = compressed or default
+    encoded = compressed.encoded
+    width = len(encoded.terminal_ids)
+    states = len(encoded.action) // width
+    rows = []
+    defaults = []
+    row_index = dict()  # (row_default, entries) -> row
+    action_row = array('i', [0] * states)
+    for state in range(states):
+        values = encoded.action[state * width:(state + 1) * width]
+        # like bison, a row with an explicit error has no default reduction, which would turn the error into a reduce
+        if lrParser.EXPLICIT_ERROR in values:
+            row_default = lrParser.ERROR
+        else:
+            row_default = mostCommon([value for value in values if value & 3 == lrParser.REDUCE])
+        entries = dict()
+        for column in range(width):
+            if values[column] != lrParser.ERROR and values[column] != row_default:
+                entries[column] = values[column]
+        key = (row_default, tuple(sorted(entries.items())))
+        if key not in row_index:
+            row_index[key] = len(rows)
+            rows.append(entries)
+            defaults.append(row_default)
+        action_row[state] = row_index[key]
+    compressed.action_row = action_row
+    compressed.action_default = array('i', defaults)
+    compressed.action_base, compressed.action_value, compressed.action_check = pack(rows)
+
+
+def compressGotoTable(compressed: CompressedTables = None) -> None:
+    compressed = compressed or default
+    encoded = compressed.encoded
+    width = len(encoded.n_terminal_ids)
+    states = len(encoded.goto) // width
+    rows = []
+    defaults = []
+    for n_terminal in range(width):
+        column = [encoded.goto[state * width + n_terminal] for state in range(states)]
+        row_default = mostCommon([value for value in column if value != 0])
+        entries = dict()
+        for state in range(states):
+            if column[state] != 0 and column[state] != row_default:
+                entries[state] = column[state]
+        rows.append(entries)
+        defaults.append(row_default)
+    compressed.goto_default = array('i', defaults)
+    compressed.goto_base, compressed.goto_value, compressed.goto_check = pack(rows)
+
+
+def compressTables(compressed: CompressedTables = None) -> None:
+    """
+    call lrParser.encodeTables() first
+    """
+    compressActionTable(compressed)
+    compressGotoTable(compressed)
+
+
+def actionOf(state: int, token: int, compressed: CompressedTables = None) -> int:
+    compressed = compressed or default
+    row = compressed.action_row[state]
+    i = compressed.action_base[row] + token
+    if 0 <= i < len(compressed.action_check) and compressed.action_check[i] == row:
+        return compressed.action_value[i]
+    return compressed.action_default[row]
+
+
+def gotoOf(state: int, n_terminal: int, compressed: CompressedTables = None) -> int:
+    compressed = compressed or default
+    i = compressed.goto_base[n_terminal] + state
+    if 0 <= i < len(compressed.goto_check) and compressed.goto_check[i] == n_terminal:
+        return compressed.goto_value[i]
+    return compressed.goto_default[n_terminal]
+
+
+def statistics(compressed: CompressedTables = None) -> dict:
+    """
+    number of ints and bytes of the dense tables of lrParser and of the compressed tables
+    """
+    compressed = compressed or default
+    dense = [compressed.encoded.action, compressed.encoded.goto]
+    arrays = [compressed.action_row, compressed.action_default, compressed.action_base, compressed.action_value,
+              compressed.action_check, compressed.goto_default, compressed.goto_base, compressed.goto_value,
+              compressed.goto_check]
+    return {
+        'states': len(compressed.action_row),
+        'action rows': len(compressed.action_default),
+        'dense ints': sum(len(a) for a in dense),
+        'dense bytes': sum(len(a) * a.itemsize for a in dense),
+        'compressed ints': sum(len(a) for a in arrays),
+        'compressed bytes': sum(len(a) * a.itemsize for a in arrays),
+    }
+
+
+def showStatistics(compressed: CompressedTables = None) -> None:
+    res = statistics(compressed)
+    for k in res:
+        print('%s: %d' % (k, res[k]))
+    print('ratio: %.3f' % (res['compressed bytes'] / res['dense bytes']))
+
+
+if __name__ == '__main__':
+    data.readData()
+    if 'lalr' in sys.argv[1:]:
+        lalrStateSet.generateLALRStateSet()
+    else:
+        lrStateSet.generateLRStateSet()
+    analyzeTable.generateAnalyzeTable()
+    lrParser.encodeTables()
+    compressTables()
+    showStatistics()
+
+    tokens = lrParser.tokenIds(lrParser.sampleProgram(10000))
+    start = time.perf_counter()
+    dense = lrParser.parseWith(tokens, lrParser.actionOf, lrParser.gotoOf)
+    dense_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    compressed = lrParser.parseWith(tokens, actionOf, gotoOf)
+    compressed_seconds = time.perf_counter() - start
+    assert dense == compressed
+    print('dense tokens per second: %.0f' % (len(tokens) / dense_seconds))
+    print('compressed tokens per second: %.0f' % (len(tokens) / compressed_seconds))
@@ -1,12 +1,32 @@
+import os
+
+import instrument
 
 EPS = ''  # epsilon
 END = '$'  # end of a string
 
-terminals = []
-n_terminals = []  # nonterminals
 
-symbols = set()
-production_rules = dict()  # str -> set of ProductionRule
+class Grammar:
+    """
+    the symbols and production rules of a grammar, the functions below work on the default instance unless given one
+    the module-level names, data.terminals and so on, are the attributes of the default instance
+    """
+    def __init__(self):
+        self.terminals = []
+        self.n_terminals = []  # nonterminals
+        self.terminal_set = set()  # same as terminals, for membership tests
+        self.n_terminal_set = set()  # same as n_terminals, for membership tests
+
+        self.symbols = set()
+        self.production_rules = dict()  # str -> set of ProductionRule
+        self.production_rule_list = []  # ProductionRule.id -> ProductionRule
+        # ids of the production rules removed by grammarAnalysis.pruneGrammar(), still in production_rule_list
+        self.pruned = set()
+
+        self.precedence = dict()  # terminal -> (level, 'left' | 'right' | 'nonassoc'), a higher level binds tighter
+
+        self.symbol_ids = dict()  # str -> int, every symbol interned to a small int
+        self.symbol_names = []  # int -> str, inverse of symbol_ids
 
 
 class ProductionRule:
@@ -34,36 +54,91 @@ class ProductionRule:
         print(end, end='')
 
 
+default = Grammar()
+
+
+def __getattr__(name):
+    return getattr(default, name)
+
+
+def internSymbol(symbol: str, grammar: Grammar = None) -> int:
+    """
+    give symbol a small int id, the same symbol always gets the same id
+    terminals are interned first, so their ids are 0, 1, ..., len(terminals) - 1
+    """
+    grammar = grammar or default
+    if symbol not in grammar.symbol_ids:
+        grammar.symbol_ids[symbol] = len(grammar.symbol_names)
+        grammar.symbol_names.append(symbol)
+    return grammar.symbol_ids[symbol]
+
+
 # init symbols and production rules
-def initProductionRules() -> None:
-    for symbol in symbols:
-        if symbol in terminals:
+def initProductionRules(grammar: Grammar = None) -> None:
+    grammar = grammar or default
+    for symbol in grammar.symbols:
+        if symbol in grammar.terminals:
             continue
-        production_rules[symbol] = set()
+        grammar.production_rules[symbol] = set()
+
+
+def clearData(grammar: Grammar = None) -> None:
+    """
+    forget the symbols and production rules read before, so that another grammar can be read
+    """
+    grammar = grammar or default
+    grammar.terminals = []
+    grammar.n_terminals = []
+    grammar.terminal_set.clear()
+    grammar.n_terminal_set.clear()
+    grammar.symbols.clear()
+    grammar.production_rules.clear()
+    grammar.production_rule_list.clear()
+    grammar.pruned.clear()
+    grammar.symbol_ids.clear()
+    grammar.symbol_names.clear()
+    grammar.precedence.clear()
 
 
-def readSymbols(terminal_file: str, n_terminal_file: str) -> None:
-    global terminals, n_terminals
+def readSymbols(terminal_file: str, n_terminal_file: str, grammar: Grammar = None) -> None:
+    grammar = grammar or default
+    clearData(grammar)
+    terminals = grammar.terminals
+    n_terminals = grammar.n_terminals
+    # symbols are separated by white space, over any number of lines
     with open(terminal_file) as f:
         for line in f.readlines():
-            terminals = line.strip().split(' ')
+            terminals += line.split()
 
     with open(n_terminal_file) as f:
         for line in f.readlines():
-            n_terminals = line.strip().split(' ')
+            n_terminals += line.split()
 
     for terminal in terminals:
-        symbols.add(terminal)
+        grammar.symbols.add(terminal)
 
     terminals.append(EPS)
-    symbols.add(EPS)
+    grammar.symbols.add(EPS)
 
     for n_terminal in n_terminals:
-        symbols.add(n_terminal)
+        grammar.symbols.add(n_terminal)
 
+    grammar.terminal_set.update(terminals)
+    grammar.n_terminal_set.update(n_terminals)
 
-def readProductionRules(production_rule_file: str) -> None:
-    initProductionRules()
+    for terminal in terminals:  # EPS is the last terminal
+        internSymbol(terminal, grammar)
+    internSymbol(END, grammar)
+    for n_terminal in n_terminals:
+        internSymbol(n_terminal, grammar)
+
+
+def readProductionRules(production_rule_file: str, grammar: Grammar = None) -> None:
+    grammar = grammar or default
+    initProductionRules(grammar)
+    production_rules = grammar.production_rules
+    grammar.production_rule_list.clear()
+    grammar.pruned.clear()
 
     id = 0
     with open(production_rule_file) as f:
@@ -72,53 +147,112 @@ def readProductionRules(production_rule_file: str) -> None:
             left = left.strip()
             rights = rights.strip().split('|')
             for right in rights:
-                right = right.strip().split(' ')
-                if left in symbols:
-                    left_symbol = left
+                right = right.strip().split()
+                if left not in production_rules:
+                    print('%s on the left side of a production rule is not a nonterminal' % left)
+                    raise Exception
+                left_symbol = left
                 right_symbol = []
                 for r in right:
                     if r == 'EPS':
                         r = ''
-                    if r in symbols:
-                        r_symbol = r
+                    if r not in grammar.symbols:
+                        print('%s in production rule %s -> %s is not a symbol' % (r, left, ' '.join(right)))
+                        raise Exception
+                    r_symbol = r
                     right_symbol.append(r_symbol)
                 production_rule = ProductionRule(id, left_symbol, right_symbol)
                 production_rules[left_symbol].add(production_rule)
+                grammar.production_rule_list.append(production_rule)
                 id += 1
 
 
-def showProductionRules() -> None:
+def readPrecedence(precedence_file: str, grammar: Grammar = None) -> None:
+    """
+    yacc style declarations, one level per line, later lines bind tighter, a missing file declares nothing
+    %left + -
+    %left * /
+    %right ^
+    """
+    grammar = grammar or default
+    precedence = grammar.precedence
+    precedence.clear()
+    if not os.path.exists(precedence_file):
+        return
+    level = 0
+    with open(precedence_file) as f:
+        for line in f.readlines():
+            line = line.strip().split()
+            if len(line) == 0:
+                continue
+            if line[0] not in ['%left', '%right', '%nonassoc']:
+                print('%s in %s is not %%left, %%right or %%nonassoc' % (line[0], precedence_file))
+                raise Exception
+            level += 1
+            for terminal in line[1:]:
+                if terminal not in grammar.terminal_set:
+                    print('%s in %s is not a terminal' % (terminal, precedence_file))
+                    raise Exception
+                precedence[terminal] = (level, line[0][1:])
+
+
+def productionPrecedence(production_rule: ProductionRule, grammar: Grammar = None):
+    """
+    level of the last terminal with a declared precedence on the right side, None if there is none
+    """
+    precedence = (grammar or default).precedence
+    res = None
+    for r in production_rule.right:
+        if r in precedence:
+            res = precedence[r][0]
+    return res
+
+
+def liveProductionRules(grammar: Grammar = None):
+    """
+    production rules in the order of their ids, without the pruned ones
+    """
+    grammar = grammar or default
+    for production_rule in grammar.production_rule_list:
+        if production_rule.id not in grammar.pruned:
+            yield production_rule
+
+
+def showProductionRules(grammar: Grammar = None) -> None:
+    production_rules = (grammar or default).production_rules
     for k in production_rules:
         for production_rule in production_rules[k]:
             production_rule.show('\n')
 
 
-def showSymbols() -> None:
-    for symbol in symbols:
+def showSymbols(grammar: Grammar = None) -> None:
+    for symbol in (grammar or default).symbols:
         print(symbol, end=' ')
     print()
 
 
-def haveDirectEmptyProductionRule(x: str) -> bool:
+def haveDirectEmptyProductionRule(x: str, grammar: Grammar = None) -> bool:
     """
     whether x has a production rule x -> epsilon
     """
-    assert x in n_terminals
-    x_production_rule_set = production_rules[x]
+    grammar = grammar or default
+    assert x in grammar.n_terminals
+    x_production_rule_set = grammar.production_rules[x]
     for x_production_rule in x_production_rule_set:
         if x_production_rule.right == [EPS]:
             return True
     return False
 
 
-def readData() -> None:
-    readSymbols('./data/terminals.txt', './data/n_terminals.txt')
+@instrument.timed('readData')
+def readData(grammar: Grammar = None) -> None:
+    readSymbols('./data/terminals.txt', './data/n_terminals.txt', grammar)
     # showSymbols()
-    readProductionRules('./data/production_rules.txt')
+    readProductionRules('./data/production_rules.txt', grammar)
     # showProductionRules()
+    readPrecedence('./data/precedence.txt', grammar)
 
 
 if __name__ == '__main__':
     readData()
     showProductionRules()
-
@@ -0,0 +1,255 @@
+import sys
+
+import data
+import instrument
+import lrStateSet
+
+# analysis of the grammar read by data, run between data.readData() and generateLRStateSet():
+# validateGrammar() checks the symbols, pruneGrammar() removes the useless production rules
+# the production rule ids do not change, a removed rule stays in data.production_rule_list and its id goes to
+# data.pruned; only data.production_rules, which the projects are made from, loses it
+
+
+class Analysis:
+    """
+    what the functions below found about a grammar, they work on the default instance unless given one
+    the module-level names, grammarAnalysis.problems and so on, are the attributes of the default instance
+    """
+    def __init__(self, grammar: data.Grammar = None):
+        self.grammar = grammar or data.default
+        self.problems = []  # what validateGrammar() found, as messages
+        self.productive = set()  # nonterminals deriving a string of terminals
+        self.reachable = set()  # symbols appearing in a sentential form of the start symbol
+        self.nullable = set()  # nonterminals deriving epsilon, the same set lrStateSet.generateNullable() finds
+
+
+default = Analysis()
+
+
+def __getattr__(name):
+    return getattr(default, name)
+
+
+def validateGrammar(analysis: Analysis = None) -> list:
+    """
+    fix what can be fixed, raise on the rest
+    a terminal listed twice is kept once; a symbol that is both a terminal and a nonterminal, a nonterminal without
+    production rules and a start rule other than S' -> S are errors
+    undefined symbols are already rejected by data.readProductionRules()
+    :return: problems
+    """
+    analysis = analysis or default
+    grammar = analysis.grammar
+    problems = analysis.problems
+    terminals = grammar.terminals
+    n_terminals = grammar.n_terminals
+    problems.clear()
+    seen = set()
+    duplicates = []
+    for terminal in terminals:
+        if terminal in seen:
+            duplicates.append(terminal)
+        seen.add(terminal)
+    for terminal in duplicates:
+        problems.append('terminal %s is listed twice, it is kept once' % terminal)
+        terminals.reverse()
+        terminals.remove(terminal)
+        terminals.reverse()
+    duplicates = [n_terminal for i, n_terminal in enumerate(n_terminals) if n_terminal in n_terminals[:i]]
+    for n_terminal in duplicates:
+        problems.append('nonterminal %s is listed twice, it is kept once' % n_terminal)
+        n_terminals.reverse()
+        n_terminals.remove(n_terminal)
+        n_terminals.reverse()
+
+    errors = []
+    for symbol in grammar.terminal_set & grammar.n_terminal_set:
+        errors.append('%s is both a terminal and a nonterminal' % symbol)
+    for n_terminal in n_terminals:
+        if len(grammar.production_rules.get(n_terminal, ())) == 0:
+            errors.append('nonterminal %s has no production rule' % n_terminal)
+    if len(grammar.production_rule_list) == 0:
+        errors.append('there is no production rule')
+    else:
+        start = grammar.production_rule_list[0]
+        if len(start.right) != 1 or start.right[0] not in grammar.n_terminal_set:
+            errors.append('the first production rule %s -> %s is not a start rule S\' -> S' % (
+                start.left, ' '.join(start.right)))
+        for production_rule in grammar.production_rule_list:
+            if start.left in production_rule.right:
+                errors.append('the start symbol %s is on the right side of production rule %d' % (
+                    start.left, production_rule.id))
+    problems.extend(errors)
+    if errors:
+        for error in errors:
+            print(error)
+        raise Exception
+    return problems
+
+
+def generateProductive(analysis: Analysis = None) -> None:
+    """
+    the worklist of lrStateSet.generateNullable(), with terminals known to be productive from the start
+    """
+    analysis = analysis or default
+    grammar = analysis.grammar
+    productive = analysis.productive
+    productive.clear()
+    remaining = dict()  # production rule id -> number of nonterminals on its right side not known to be productive
+    occurrences = dict()  # nonterminal -> production rules with it on the right side
+    worklist = []
+    for production_rule in grammar.production_rule_list:
+        right = [r for r in production_rule.right if r in grammar.n_terminal_set]
+        remaining[production_rule.id] = len(right)
+        for r in right:
+            occurrences.setdefault(r, []).append(production_rule)
+        if len(right) == 0 and production_rule.left not in productive:
+            productive.add(production_rule.left)
+            worklist.append(production_rule.left)
+    while worklist:
+        symbol = worklist.pop()
+        for production_rule in occurrences.get(symbol, ()):
+            remaining[production_rule.id] -= 1
+            if remaining[production_rule.id] == 0 and production_rule.left not in productive:
+                productive.add(production_rule.left)
+                worklist.append(production_rule.left)
+
+
+def generateReachable(analysis: Analysis = None) -> None:
+    """
+    symbols reachable from the start symbol through the production rules not pruned
+    """
+    analysis = analysis or default
+    grammar = analysis.grammar
+    reachable = analysis.reachable
+    reachable.clear()
+    start = grammar.production_rule_list[0].left
+    reachable.add(start)
+    worklist = [start]
+    while worklist:
+        symbol = worklist.pop()
+        for production_rule in grammar.production_rules.get(symbol, ()):
+            for r in production_rule.right:
+                if r != data.EPS and r not in reachable:
+                    reachable.add(r)
+                    if r in grammar.n_terminal_set:
+                        worklist.append(r)
+
+
+@instrument.timed('pruneGrammar')
+def pruneGrammar(analysis: Analysis = None) -> set:
+    """
+    remove the production rules using an unproductive nonterminal, then the ones of unreachable nonterminals,
+    in this order, so a symbol only reachable through an unproductive rule goes too
+    also computes productive, reachable and nullable
+    :return: ids of the removed production rules
+    """
+    analysis = analysis or default
+    grammar = analysis.grammar
+    productive = analysis.productive
+    pruned = grammar.pruned
+    generateProductive(analysis)
+    start = grammar.production_rule_list[0].left
+    if start not in productive:
+        print('the start symbol %s derives no string of terminals' % start)
+        raise Exception
+    for production_rule in grammar.production_rule_list:
+        if production_rule.left not in productive or \
+                any(r in grammar.n_terminal_set and r not in productive for r in production_rule.right):
+            pruned.add(production_rule.id)
+    for production_rule_id in pruned:
+        production_rule = grammar.production_rule_list[production_rule_id]
+        grammar.production_rules[production_rule.left].discard(production_rule)
+
+    generateReachable(analysis)
+    for production_rule in grammar.production_rule_list:
+        if production_rule.id not in pruned and production_rule.left not in analysis.reachable:
+            pruned.add(production_rule.id)
+            grammar.production_rules[production_rule.left].discard(production_rule)
+
+    analysis.nullable.clear()
+    analysis.nullable.update(lrStateSet.nullableSymbols(grammar))
+    return set(pruned)
+
+
+def prepareGrammar(analysis: Analysis = None) -> list:
+    """
+    validateGrammar() then pruneGrammar()
+    :return: problems, with one more message per removed production rule
+    """
+    analysis = analysis or default
+    grammar = analysis.grammar
+    productive = analysis.productive
+    validateGrammar(analysis)
+    for production_rule_id in sorted(pruneGrammar(analysis)):
+        production_rule = grammar.production_rule_list[production_rule_id]
+        reason = 'unreachable' if production_rule.left in productive and \
+            all(r not in grammar.n_terminal_set or r in productive for r in production_rule.right) else 'unproductive'
+        analysis.problems.append('production rule %d %s -> %s removed, %s' % (
+            production_rule_id, production_rule.left, ' '.join(r or 'EPS' for r in production_rule.right), reason))
+    return analysis.problems
+
+
+def buildSize() -> dict:
+    """
+    generateLRStateSet() and the sizes of what it built
+    """
+    lrStateSet.generateLRStateSet()
+    return {
+        'production rules': sum(1 for _ in data.liveProductionRules()),
+        'projects': len(lrStateSet.lr_projects),
+        'items': sum(len(state.items) for state in lrStateSet.state_set),
+        'states': lrStateSet.length,
+    }
+
+
+def savings(files: tuple) -> tuple:
+    """
+    build the grammar in files as it is, then prepared
+    :return: (sizes as it is, sizes prepared, problems)
+    """
+    def read():
+        data.readSymbols(files[0], files[1])
+        data.readProductionRules(files[2])
+        if len(files) > 3:
+            data.readPrecedence(files[3])
+
+    read()
+    before = buildSize()
+    read()
+    prepareGrammar()
+    after = buildSize()
+    return before, after, list(default.problems)
+
+
+if __name__ == '__main__':
+    import os
+    import tempfile
+
+    import grammarGenerator
+
+    # the expression grammar with an unproductive nonterminal (P), an unproductive alternative (Q -> Q ? P), an
+    # unreachable nonterminal (U) and a nonterminal only reachable through unproductive rules (R)
+    useless = grammarGenerator.grammarFromRules('''
+E' -> E
+E -> E + T | E - T | T
+T -> T * F | T / F | T % F | F
+F -> ( E ) | - F | ID | NUM | ID ( args ) | P ! | Q @
+args -> arglist | EPS
+arglist -> arglist , E | E
+P -> P [ E ] | R P
+R -> ~ | R ~
+Q -> Q ? P | #
+U -> U ; E | ID
+''')
+    with tempfile.TemporaryDirectory() as directory:
+        grammars = [('bundled', ('./data/terminals.txt', './data/n_terminals.txt', './data/production_rules.txt')),
+                    ('useless', grammarGenerator.writeGrammar(os.path.join(directory, 'useless'), useless))]
+        for name, files in grammars:
+            before, after, found = savings(files)
+            print(name)
+            for problem in found:
+                print('  ' + problem)
+            for k in before:
+                print('  %-17s %6d -> %6d  saved %6d' % (k, before[k], after[k], before[k] - after[k]))
+            print('  nullable: %s' % ' '.join(sorted(default.nullable)), file=sys.stderr)
@@ -0,0 +1,214 @@
+import os
+import random
+
+# a grammar here is (terminals, n_terminals, rules), rules is a list of (left, list of alternatives),
+# an alternative is a list of symbols, [] is EPS; the first rule is the start rule
+# a precedence is a list of (associativity, terminals), the last one binds tightest, like precedence.txt
+
+
+def syntheticGrammar(n_terminals: int = 10, n_n_terminals: int = 10, alternatives: int = 3, rhs_length: int = 4,
+                     epsilon: float = 0.1, recursion: str = 'mixed', seed: int = 0) -> tuple:
+    """
+    random grammar in which every nonterminal is reachable and productive
+    :param n_terminals: number of terminals t0, t1, ...
+    :param n_n_terminals: number of nonterminals N0, N1, ... besides the start symbol S'
+    :param alternatives: number of alternatives of every nonterminal
+    :param rhs_length: maximum number of symbols of an alternative
+    :param epsilon: probability that the terminal-only alternative of a nonterminal is EPS
+    :param recursion: 'none', 'left' (N -> N a), 'right' (N -> a N) or 'mixed' (left, right or a N b)
+    :param seed: seed of the random generator, the same arguments give the same grammar
+    """
+    rand = random.Random(seed)
+    terminals = ['t%d' % i for i in range(n_terminals)]
+    n_terminals_ = ['N%d' % i for i in range(n_n_terminals)]
+    symbols = terminals + n_terminals_
+
+    def randomTerminals(length):
+        return [rand.choice(terminals) for _ in range(length)]
+
+    rules = [("S'", [[n_terminals_[0]]])]
+    for i, left in enumerate(n_terminals_):
+        rights = []
+        # N(i) -> ... N(i+1) ... keeps every nonterminal reachable
+        if i + 1 < n_n_terminals:
+            right = [rand.choice(symbols) for _ in range(rand.randint(0, rhs_length - 1))]
+            right.insert(rand.randint(0, len(right)), n_terminals_[i + 1])
+            rights.append(right)
+        if recursion != 'none':
+            kind = recursion if recursion != 'mixed' else rand.choice(['left', 'right', 'middle'])
+            rest = randomTerminals(rand.randint(1, max(1, rhs_length - 1)))
+            if kind == 'left':
+                rights.append([left] + rest)
+            elif kind == 'right':
+                rights.append(rest + [left])
+            else:
+                rights.append(rest[:1] + [left] + randomTerminals(1))
+        while len(rights) < alternatives - 1:
+            rights.append([rand.choice(symbols) for _ in range(rand.randint(1, rhs_length))])
+        # a terminal-only alternative keeps every nonterminal productive
+        if rand.random() < epsilon:
+            rights.append([])
+        else:
+            rights.append(randomTerminals(rand.randint(1, rhs_length)))
+
+        unique = []
+        for right in rights:
+            if right not in unique:
+                unique.append(right)
+        rules.append((left, unique))
+    return terminals, ["S'"] + n_terminals_, rules
+
+
+def parseRules(text: str) -> list:
+    rules = []
+    for line in text.strip().split('\n'):
+        left, rights = line.split('->')
+        alternatives = []
+        for right in rights.split('|'):
+            right = right.split()
+            alternatives.append([] if right == ['EPS'] else right)
+        rules.append((left.strip(), alternatives))
+    return rules
+
+
+def grammarFromRules(text: str) -> tuple:
+    """
+    grammar from rules written like production_rules.txt, the terminals are the symbols that are never on a left side
+    """
+    rules = parseRules(text)
+    n_terminals = [left for left, alternatives in rules]
+    terminals = []
+    for left, alternatives in rules:
+        for right in alternatives:
+            for symbol in right:
+                if symbol not in n_terminals and symbol not in terminals:
+                    terminals.append(symbol)
+    return terminals, n_terminals, rules
+
+
+def expressionGrammar() -> tuple:
+    """
+    arithmetic expressions with precedence levels written as left recursive rules
+    """
+    return grammarFromRules('''
+E' -> E
+E -> E + T | E - T | T
+T -> T * F | T / F | T % F | F
+F -> ( E ) | - F | ID | NUM | ID ( args )
+args -> arglist | EPS
+arglist -> arglist , E | E
+''')
+
+
+def statementGrammar() -> tuple:
+    """
+    declarations, statements and expressions of a small C like language
+    """
+    return grammarFromRules('''
+program' -> program
+program -> decls funcs
+decls -> decls decl | EPS
+decl -> type ID ; | type ID = expr ;
+type -> int | real | bool
+funcs -> funcs func | func
+func -> type ID ( params ) block
+params -> paramlist | EPS
+paramlist -> paramlist , type ID | type ID
+block -> { decls stmts }
+stmts -> stmts stmt | EPS
+stmt -> ID = expr ; | if ( expr ) stmt | if ( expr ) stmt else stmt | while ( expr ) stmt | block | return expr ; | call ;
+call -> ID ( args )
+args -> arglist | EPS
+arglist -> arglist , expr | expr
+expr -> expr or andexpr | andexpr
+andexpr -> andexpr and relexpr | relexpr
+relexpr -> addexpr < addexpr | addexpr <= addexpr | addexpr == addexpr | addexpr != addexpr | addexpr
+addexpr -> addexpr + mulexpr | addexpr - mulexpr | mulexpr
+mulexpr -> mulexpr * unary | mulexpr / unary | unary
+unary -> not unary | - unary | primary
+primary -> ID | NUM | REALNUM | true | false | ( expr ) | call
+''')
+
+
+def ambiguousGrammar() -> tuple:
+    """
+    the bundled grammar with its factored arithmetic expressions written as one ambiguous rule,
+    it accepts the same programs once arithmeticPrecedence() settles the conflicts
+    """
+    return grammarFromRules('''
+program' -> program
+program -> decls compoundstmt
+decls -> decl ; decls | EPS
+decl -> int ID = INTNUM | real ID = REALNUM
+stmt -> ifstmt | assgstmt | compoundstmt
+compoundstmt -> { stmts }
+stmts -> stmt stmts | EPS
+ifstmt -> if ( boolexpr ) then stmt else stmt
+assgstmt -> ID = arithexpr ;
+boolexpr -> arithexpr boolop arithexpr
+boolop -> < | > | <= | >= | ==
+arithexpr -> arithexpr + arithexpr | arithexpr - arithexpr | arithexpr * arithexpr | arithexpr / arithexpr | ID | INTNUM | REALNUM | ( arithexpr )
+''')
+
+
+def arithmeticPrecedence() -> list:
+    return [('left', ['+', '-']), ('left', ['*', '/'])]
+
+
+def randomSentence(grammar: tuple, seed: int = 0, max_depth: int = 10) -> list:
+    """
+    terminals of a random derivation of the start symbol, below max_depth every nonterminal takes the alternative
+    with the lowest derivation tree
+    """
+    rand = random.Random(seed)
+    terminals, n_terminals, rules = grammar
+    alternatives = dict(rules)
+    height = dict()  # nonterminal -> height of its lowest derivation tree
+    changed = True
+    while changed:
+        changed = False
+        for left, rights in rules:
+            for right in rights:
+                if all(symbol in height for symbol in right if symbol in alternatives):
+                    h = 1 + max([height[symbol] for symbol in right if symbol in alternatives] + [0])
+                    if h < height.get(left, h + 1):
+                        height[left] = h
+                        changed = True
+
+    def lowest(right):
+        return max([height.get(symbol, len(height) + 1) for symbol in right if symbol in alternatives] + [0])
+
+    res = []
+    stack = [(rules[0][0], 0)]
+    while stack:
+        symbol, depth = stack.pop()
+        if symbol not in alternatives:
+            res.append(symbol)
+            continue
+        rights = alternatives[symbol]
+        right = rand.choice(rights) if depth < max_depth else min(rights, key=lowest)
+        for r in reversed(right):
+            stack.append((r, depth + 1))
+    return res
+
+
+def writeGrammar(directory: str, grammar: tuple, precedence: list = None) -> tuple:
+    """
+    write grammar in the format of ./data, precedence.txt is empty when precedence is None
+    :return: (terminal file, nonterminal file, production rule file, precedence file)
+    """
+    terminals, n_terminals, rules = grammar
+    os.makedirs(directory, exist_ok=True)
+    files = (os.path.join(directory, 'terminals.txt'), os.path.join(directory, 'n_terminals.txt'),
+             os.path.join(directory, 'production_rules.txt'), os.path.join(directory, 'precedence.txt'))
+    with open(files[0], 'w') as f:
+        f.write(' '.join(terminals))
+    with open(files[1], 'w') as f:
+        f.write(' '.join(n_terminals))
+    with open(files[2], 'w') as f:
+        for left, alternatives in rules:
+            f.write('%s -> %s\n' % (left, ' | '.join(' '.join(right) if right else 'EPS' for right in alternatives)))
+    with open(files[3], 'w') as f:
+        for associativity, terminals_ in precedence or []:
+            f.write('%%%s %s\n' % (associativity, ' '.join(terminals_)))
+    return files
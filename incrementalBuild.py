@@ -0,0 +1,256 @@
+import os
+import pickle
+import sys
+
+import analyzeTable
+import data
+import lrStateSet
+
+SNAPSHOT = './cache/incremental.pickle'  # one snapshot per grammar, builders of other grammars need their own path
+
+
+class IncrementalBuild:
+    """
+    the lrStateSet.StateSet an incremental build fills, the functions below work on the default instance unless given
+    one, the module-level name incrementalBuild.statistics is the attribute of the default instance
+    """
+    def __init__(self, state_set: lrStateSet.StateSet = None):
+        self.state_set = state_set or lrStateSet.default
+        self.statistics = dict()  # what the last generateLRStateSet() reused and recomputed
+
+
+default = IncrementalBuild()
+
+
+def __getattr__(name):
+    return getattr(default, name)
+
+
+def productionKeys(grammar: data.Grammar = None) -> list:
+    """
+    (left, right) of every production rule, indexed by production rule id, None for the ones pruned by
+    grammarAnalysis, which generateLRStateSet() does not use
+    """
+    grammar = grammar or data.default
+    return [None if production_rule.id in grammar.pruned else (production_rule.left, tuple(production_rule.right))
+            for production_rule in grammar.production_rule_list]
+
+
+def stateKernel(state: lrStateSet.State, grammar: data.Grammar = None) -> frozenset:
+    kernel = set()
+    for production_rule_id, dot, look_forward in state.items:
+        if dot > 0:
+            kernel.add((production_rule_id, dot, look_forward))
+    if state.id == 0:
+        kernel.add((0, 0, (grammar or data.default).symbol_ids[data.END]))
+    return lrStateSet.kernelKey(kernel)
+
+
+def snapshot(lr: lrStateSet.StateSet = None) -> dict:
+    """
+    what the next incremental build needs from this one: the grammar, first and the closure of every kernel
+    """
+    lr = lr or lrStateSet.default
+    grammar = lr.grammar
+    closures = dict()
+    for state in lr.state_set:
+        closures[stateKernel(state, grammar)] = frozenset(state.items)
+    return {
+        'terminals': list(grammar.terminals),
+        'n_terminals': list(grammar.n_terminals),
+        'production_rules': productionKeys(grammar),
+        'first': dict(lr.first),
+        'closures': closures,
+    }
+
+
+def saveSnapshot(path: str, lr: lrStateSet.StateSet = None) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp, 'wb') as f:
+        pickle.dump(snapshot(lr), f)
+    os.replace(tmp, path)
+
+
+def loadSnapshot(path: str):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def matchProductionRules(old: list, new: list) -> dict:
+    """
+    old production rule id -> new production rule id, for the rules in both lists
+    a rule is matched by its content, the i-th copy of a rule in old to the i-th copy in new, pruned rules never
+    """
+    positions = dict()  # (left, right) -> new ids
+    for id, key in enumerate(new):
+        if key is not None:
+            positions.setdefault(key, []).append(id)
+    res = dict()
+    used = dict()
+    for id, key in enumerate(old):
+        if key is None:
+            continue
+        i = used.get(key, 0)
+        if i < len(positions.get(key, [])):
+            res[id] = positions[key][i]
+            used[key] = i + 1
+    return res
+
+
+def generateFirstIncremental(previous: dict, changed: set, build: IncrementalBuild = None) -> set:
+    """
+    recompute nullable, and first only for the nonterminals that can derive a nonterminal in changed,
+    the other ones keep the first of the previous build
+    :return: nonterminals whose first (with EPS for nullable) is different from the previous build
+    """
+    build = build or default
+    lr = build.state_set
+    grammar = lr.grammar
+    first = lr.first
+    users = dict()  # B -> nonterminals with B on the right side of one of their production rules
+    for production_rule in data.liveProductionRules(grammar):
+        for right in production_rule.right:
+            if right in grammar.n_terminal_set:
+                users.setdefault(right, set()).add(production_rule.left)
+    affected = set(changed)
+    worklist = list(changed)
+    while worklist:
+        symbol = worklist.pop()
+        for user in users.get(symbol, ()):
+            if user not in affected:
+                affected.add(user)
+                worklist.append(user)
+
+    lrStateSet.initFirst(lr)
+    lr.first_cache.clear()
+    lr.closure_cache.clear()
+    for symbol in previous['first']:
+        if symbol not in affected:
+            first[symbol] = previous['first'][symbol]
+
+    # nullable is linear in the size of the grammar, it is not worth reusing
+    lrStateSet.generateNullable(lr)
+
+    # first, the first of an unaffected nonterminal is a constant
+    nodes = [n_terminal for n_terminal in grammar.n_terminals if n_terminal in affected]
+    direct = dict()
+    depends = dict()
+    for n_terminal in nodes:
+        direct[n_terminal] = 0
+        depends[n_terminal] = []
+    for production_rule in data.liveProductionRules(grammar):
+        if production_rule.left not in affected:
+            continue
+        for right in production_rule.right:
+            if right == data.EPS:
+                break
+            if right in grammar.terminal_set:
+                direct[production_rule.left] |= first[right]
+                break
+            if right in affected:
+                depends[production_rule.left].append(right)
+            else:
+                direct[production_rule.left] |= first[right] & ~lr.eps_bit
+            if right not in lr.nullable_symbols:
+                break
+    first_n_terminals = lrStateSet.digraph(nodes, depends, direct)
+    for n_terminal in nodes:
+        first[n_terminal] = first_n_terminals[n_terminal]
+        if n_terminal in lr.nullable_symbols:
+            first[n_terminal] |= lr.eps_bit
+
+    build.statistics['affected nonterminals'] = len(nodes)
+    res = set()
+    for n_terminal in nodes:
+        if first[n_terminal] != previous['first'].get(n_terminal):
+            res.add(n_terminal)
+    return res
+
+
+def reuseClosures(previous: dict, production_map: dict, dirty: set, lr: lrStateSet.StateSet = None) -> None:
+    """
+    put the closures of the previous build that do not depend on a dirty nonterminal into the closure_cache of lr,
+    with their production rule ids translated
+    a closure depends on the production rules and the first of every symbol after a ·
+    """
+    closure_cache = (lr or lrStateSet.default).closure_cache
+    for kernel, items in previous['closures'].items():
+        reusable = True
+        for production_rule_id, dot, look_forward in items:
+            if production_rule_id not in production_map:
+                reusable = False
+                break
+            for symbol in previous['production_rules'][production_rule_id][1][dot:]:
+                if symbol in dirty:
+                    reusable = False
+                    break
+            if not reusable:
+                break
+        if not reusable:
+            continue
+        new_kernel = lrStateSet.kernelKey((production_map[p], dot, look_forward) for p, dot, look_forward in kernel)
+        closure_cache[new_kernel] = frozenset((production_map[p], dot, look_forward) for p, dot, look_forward in items)
+
+
+def generateLRStateSet(path: str = SNAPSHOT, build: IncrementalBuild = None) -> None:
+    """
+    used in place of lrStateSet.generateLRStateSet(), the result is the same as a full build
+    when only production_rules.txt changed since the last build, the closures of the states that cannot reach a
+    changed production rule are reused; otherwise everything is built again
+    """
+    build = build or default
+    lr = build.state_set
+    grammar = lr.grammar
+    statistics = build.statistics
+    statistics.clear()
+    previous = loadSnapshot(path)
+    if previous is None or previous['terminals'] != grammar.terminals or \
+            previous['n_terminals'] != grammar.n_terminals:
+        lrStateSet.generateLRStateSet(1, lr)
+        statistics['full build'] = True
+        statistics['closures computed'] = lr.length
+        saveSnapshot(path, lr)
+        return
+
+    old = previous['production_rules']
+    new = productionKeys(grammar)
+    production_map = matchProductionRules(old, new)
+    matched = set(production_map.values())
+    changed = set()
+    for id, key in enumerate(old):
+        if key is not None and id not in production_map:
+            changed.add(key[0])
+    for id, key in enumerate(new):
+        if key is not None and id not in matched:
+            changed.add(key[0])
+
+    first_changed = generateFirstIncremental(previous, changed, build)
+    lrStateSet.generateLRProjects(lr)
+    reuseClosures(previous, production_map, changed | first_changed, lr)
+    reused = set(lr.closure_cache)
+    lrStateSet.items(lr)
+    lr.length = len(lr.state_set)
+
+    statistics['full build'] = False
+    statistics['changed production rules'] = sum(1 for key in old if key is not None) - len(production_map) + \
+        sum(1 for key in new if key is not None) - len(matched)
+    statistics['first changed'] = len(first_changed)
+    statistics['closures reused'] = sum(1 for state in lr.state_set if stateKernel(state, grammar) in reused)
+    statistics['closures computed'] = lr.length - statistics['closures reused']
+    saveSnapshot(path, lr)
+
+
+if __name__ == '__main__':
+    data.readData()
+    generateLRStateSet()
+    analyzeTable.generateAnalyzeTable()
+    if '-o' in sys.argv[1:]:  # -o FILE: write the table to FILE, the format is chosen by its extension
+        import tableFile
+        tableFile.writeTable(sys.argv[sys.argv.index('-o') + 1])
+    else:
+        analyzeTable.showAnalyzeTable()
+    for k in default.statistics:
+        print('%s: %s' % (k, default.statistics[k]), file=sys.stderr)
@@ -0,0 +1,100 @@
+import functools
+import json
+import time
+
+# timings and counters of the table generator, nothing is recorded unless enable() is called
+# hot functions check enabled before counting, so the cost when disabled is one flag test per call
+enabled = False
+phases = dict()  # phase -> [seconds, calls]
+counters = dict()  # name -> int
+
+
+def enable() -> None:
+    global enabled
+    reset()
+    enabled = True
+
+
+def disable() -> None:
+    global enabled
+    enabled = False
+
+
+def reset() -> None:
+    phases.clear()
+    counters.clear()
+
+
+def add(name: str, n: int = 1) -> None:
+    counters[name] = counters.get(name, 0) + n
+
+
+def record(phase: str, seconds: float) -> None:
+    if phase not in phases:
+        phases[phase] = [0.0, 0]
+    phases[phase][0] += seconds
+    phases[phase][1] += 1
+
+
+def merge(other: dict) -> None:
+    """
+    add the phases and counters of a report() made in another process, a worker of lrStateSet.parallelItems()
+    """
+    for phase in other['phases']:
+        if phase not in phases:
+            phases[phase] = [0.0, 0]
+        phases[phase][0] += other['phases'][phase]['seconds']
+        phases[phase][1] += other['phases'][phase]['calls']
+    for name in other['counters']:
+        add(name, other['counters'][name])
+
+
+def timed(phase: str):
+    """
+    decorator adding the time of every call of the function to phase, when enabled
+    phases can be nested, the time of items includes the time of the closure calls it makes
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(phase, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def report() -> dict:
+    return {
+        'phases': {phase: {'seconds': phases[phase][0], 'calls': phases[phase][1]} for phase in phases},
+        'counters': dict(counters),
+    }
+
+
+def reportJson() -> str:
+    return json.dumps(report(), indent=2)
+
+
+if __name__ == '__main__':
+    # the generator modules import this file as the module instrument, not as __main__, so go through it
+    # they also use timed() while they are being defined, so they cannot be imported at the top of this file
+    import sys
+
+    import analyzeTable
+    import data
+    import instrument
+    import lalrStateSet
+    import lrStateSet
+
+    instrument.enable()
+    data.readData()
+    if 'lalr' in sys.argv[1:]:
+        lalrStateSet.generateLALRStateSet()
+    else:
+        lrStateSet.generateLRStateSet()
+    analyzeTable.generateAnalyzeTable()
+    print(instrument.reportJson())
@@ -0,0 +1,223 @@
+from collections import deque
+
+import data
+import instrument
+import lrStateSet
+
+conflicts = []  # (state id, look_forward, production rule ids) of every reduce/reduce conflict of the default build
+
+
+# build the LR(0) automaton
+def closure0(cores: set, lr: lrStateSet.StateSet = None) -> set:
+    """
+    LR(0) closure of a set of (production rule id, dot)
+    A -> a · Bb in cores => B -> · c is added for every production rule B -> c
+    """
+    lr = lr or lrStateSet.default
+    project_by_core = lr.project_by_core
+    initial_items = lr.initial_items
+    res = set(cores)
+    worklist = list(cores)
+    while worklist:
+        core = worklist.pop()
+        lr_project = project_by_core[core]
+        if len(lr_project.equivalence) == 0:
+            continue
+        for new_core in initial_items[lr_project.nextSymbol()]:
+            if new_core not in res:
+                res.add(new_core)
+                worklist.append(new_core)
+    return res
+
+
+def items0(lr: lrStateSet.StateSet = None) -> list:
+    """
+    build the LR(0) collection with a worklist, state ids are given in breadth-first order like lrStateSet.items()
+    :return: list of (set of cores, goto dict) indexed by state id
+    """
+    lr = lr or lrStateSet.default
+    project_by_core = lr.project_by_core
+    symbols = lrStateSet.orderedSymbols(lr.grammar)
+    start = frozenset([(0, 0)])
+    states = [(closure0(start, lr), dict())]
+    kernel_index = {start: 0}
+
+    worklist = deque([0])
+    while worklist:
+        state_id = worklist.popleft()
+        cores, goto = states[state_id]
+        next_cores = dict()  # X -> kernel of goto(state, X)
+        for production_rule_id, dot in cores:
+            lr_project = project_by_core[(production_rule_id, dot)]
+            if lr_project.reduce:
+                continue
+            next_cores.setdefault(lr_project.nextSymbol(), set()).add((production_rule_id, dot + 1))
+        for symbol in symbols:
+            if symbol not in next_cores:
+                continue
+            kernel = frozenset(next_cores[symbol])
+            if kernel not in kernel_index:
+                kernel_index[kernel] = len(states)
+                states.append((closure0(kernel, lr), dict()))
+                worklist.append(kernel_index[kernel])
+            goto[symbol] = kernel_index[kernel]
+    return states
+
+
+# compute lookaheads, DeRemer and Pennello, Efficient Computation of LALR(1) Look-Ahead Sets
+def nullable(symbols: list, lr: lrStateSet.StateSet = None) -> bool:
+    nullable_symbols = (lr or lrStateSet.default).nullable_symbols
+    for symbol in symbols:
+        if symbol not in nullable_symbols:
+            return False
+    return True
+
+
+def walk(states: list, state_id: int, symbols: list) -> list:
+    """
+    ids of the states passed through when reading symbols from state_id, the first one is state_id itself
+    """
+    path = [state_id]
+    for symbol in symbols:
+        state_id = states[state_id][1][symbol]
+        path.append(state_id)
+    return path
+
+
+def lookaheads(states: list, lr: lrStateSet.StateSet = None) -> dict:
+    """
+    :return: (state id, production rule id, dot) -> bitmask of look_forward, for every item of the LR(0) automaton
+    """
+    lr = lr or lrStateSet.default
+    grammar = lr.grammar
+    project_by_core = lr.project_by_core
+    end_bit = lrStateSet.symbolsToBits([data.END], grammar)
+
+    # nonterminal transitions (p, A)
+    transitions = []
+    for p, (cores, goto) in enumerate(states):
+        for symbol in goto:
+            if symbol in grammar.n_terminal_set:
+                transitions.append((p, symbol))
+
+    # DR(p, A): terminals read right after the transition, and reads: nullable nonterminals read after it
+    direct_read = dict()
+    reads = dict()
+    for p, symbol in transitions:
+        r = states[p][1][symbol]
+        direct_read[(p, symbol)] = 0
+        reads[(p, symbol)] = []
+        for next_symbol in states[r][1]:
+            if next_symbol in grammar.n_terminal_set:
+                if next_symbol in lr.nullable_symbols:
+                    reads[(p, symbol)].append((r, next_symbol))
+            else:
+                direct_read[(p, symbol)] |= lrStateSet.symbolsToBits([next_symbol], grammar)
+        if (0, 1) in states[r][0]:  # S' -> S ·, accepted when the input ends
+            direct_read[(p, symbol)] |= end_bit
+    read = lrStateSet.digraph(transitions, reads, direct_read)
+
+    # includes: (p, A) includes (p', B) if B -> b A c, c is nullable and p' reaches p by reading b
+    includes = dict()
+    for p_, left in transitions:
+        for production_rule in grammar.production_rules[left]:
+            right = project_by_core[(production_rule.id, 0)].right
+            path = walk(states, p_, right)
+            for i, symbol in enumerate(right):
+                if symbol in grammar.n_terminal_set and nullable(right[i + 1:], lr):
+                    includes.setdefault((path[i], symbol), []).append((p_, left))
+    follow = lrStateSet.digraph(transitions, includes, read)
+
+    # every item B -> b · c on the path of B -> bc from p' gets Follow(p', B), the last one is the lookback relation
+    res = dict()
+    for p_, left in transitions:
+        for production_rule in grammar.production_rules[left]:
+            right = project_by_core[(production_rule.id, 0)].right
+            for dot, q in enumerate(walk(states, p_, right)):
+                key = (q, production_rule.id, dot)
+                res[key] = res.get(key, 0) | follow[(p_, left)]
+    start_right = project_by_core[(0, 0)].right
+    for dot, q in enumerate(walk(states, 0, start_right)):
+        res[(q, 0, dot)] = res.get((q, 0, dot), 0) | end_bit
+    return res
+
+
+def reduceConflicts(state_set: set, lr: lrStateSet.StateSet = None) -> list:
+    """
+    reduce/reduce conflicts: two reduce projects of a state with the same look_forward
+    :return: list of (state id, look_forward, production rule ids)
+    """
+    lr = lr or lrStateSet.default
+    project_by_core = lr.project_by_core
+    res = []
+    for state in sorted(state_set, key=lambda s: s.id):
+        reduce_by = dict()  # look_forward -> production rule ids
+        for production_rule_id, dot, look_forward in state.items:
+            if project_by_core[(production_rule_id, dot)].reduce:
+                reduce_by.setdefault(look_forward, set()).add(production_rule_id)
+        for look_forward in sorted(reduce_by):
+            if len(reduce_by[look_forward]) > 1:
+                res.append((state.id, lr.grammar.symbol_names[look_forward], sorted(reduce_by[look_forward])))
+    return res
+
+
+@instrument.timed('lalr items')
+def items(lr: lrStateSet.StateSet = None):
+    """
+    build the LALR(1) collection: the LR(0) automaton with lookaheads, the states are lrStateSet.State
+    """
+    lr = lr or lrStateSet.default
+    states = items0(lr)
+    la = lookaheads(states, lr)
+    lr.state_set = set()
+    lr.state_list.clear()
+    for id, (cores, goto) in enumerate(states):
+        state = lrStateSet.State(id)
+        for production_rule_id, dot in cores:
+            for look_forward in lrStateSet.bitsToIds(la.get((id, production_rule_id, dot), 0)):
+                state.addItem((production_rule_id, dot, look_forward))
+        state.goto = dict(goto)
+        lr.state_set.add(state)
+        lr.state_list.append(state)
+
+
+def generateLALRStateSet(lr: lrStateSet.StateSet = None) -> list:
+    """
+    used in place of lrStateSet.generateLRStateSet(), analyzeTable reads the same state_set
+    :return: the reduce/reduce conflicts, also kept in conflicts when lr is the default
+    """
+    lr = lr or lrStateSet.default
+    lrStateSet.generateFirst(lr)
+    lrStateSet.generateLRProjects(lr)
+    items(lr)
+    lr.length = len(lr.state_set)
+    res = reduceConflicts(lr.state_set, lr)
+    if lr is lrStateSet.default:
+        conflicts[:] = res
+    return res
+
+
+def stateCore(state: lrStateSet.State) -> frozenset:
+    return frozenset((production_rule_id, dot) for production_rule_id, dot, look_forward in state.items)
+
+
+if __name__ == '__main__':
+    data.readData()
+    lrStateSet.generateLRStateSet()
+    lr1_length = lrStateSet.length
+    by_id = {state.id: state for state in lrStateSet.state_set}
+    lr1_conflicts = set()
+    for id, look_forward, production_rule_ids in reduceConflicts(lrStateSet.state_set):
+        lr1_conflicts.add((stateCore(by_id[id]), look_forward, tuple(production_rule_ids)))
+
+    generateLALRStateSet()
+    print('LR(1) states: %d' % lr1_length)
+    print('LALR(1) states: %d' % lrStateSet.length)
+    by_id = {state.id: state for state in lrStateSet.state_set}
+    added = 0
+    for id, look_forward, production_rule_ids in conflicts:
+        if (stateCore(by_id[id]), look_forward, tuple(production_rule_ids)) in lr1_conflicts:
+            continue
+        added += 1
+        print('reduce/reduce conflict added by merging: I%d on %s between %s' % (id, look_forward, production_rule_ids))
+    print('reduce/reduce conflicts added by merging: %d' % added)
@@ -0,0 +1,272 @@
+import os
+import pickle
+import sys
+import time
+from array import array
+from collections import OrderedDict
+
+import analyzeTable
+import data
+import lrParser
+import lrStateSet
+import tableCache
+
+# LR(1) tables built while parsing: a state is only a kernel until the parser first reaches it, then its closure,
+# ACTION row and GOTO row are computed and kept in rows
+# state ids are given in the order the states are discovered, not in the breadth-first order of lrStateSet.items(),
+# the production rule ids, and so the reductions of a parse, are the same
+
+
+class LazyTable:
+    """
+    the kernels and rows built so far, for the grammar of an lrParser.EncodedTables, whose table.state_set keeps the
+    first, the projects and the closures and whose table keeps the conflicts; the functions below work on the default
+    instance unless given one, the module-level names, lazyTable.rows and so on, are its attributes
+    """
+    def __init__(self, encoded: lrParser.EncodedTables = None):
+        self.encoded = encoded or lrParser.default
+        self.kernels = []  # state id -> kernel key, kept for every discovered state so ids stay valid after an eviction
+        self.kernel_index = dict()  # kernel key -> state id
+        self.rows = OrderedDict()  # state id -> (ACTION row, GOTO row), least recently used first when limit is set
+        self.limit = None  # maximum number of rows kept, None keeps every row
+        self.statistics = dict()  # rows materialized, rows evicted, rows loaded from a warm cache
+        self.reported = set()  # ids of the states whose conflicts are in table.conflicts, a row built again adds none
+
+
+default = LazyTable()
+
+
+def __getattr__(name):
+    return getattr(default, name)
+
+
+def generateLazyTable(row_limit: int = None, lazy: LazyTable = None) -> None:
+    """
+    used in place of generateLRStateSet() and generateAnalyzeTable(), only the first, the projects and state 0 are
+    prepared, call data.readData() first
+    :param row_limit: maximum number of rows kept in memory, the least recently used row is evicted beyond it
+    """
+    lazy = lazy or default
+    table = lazy.encoded.table
+    lrStateSet.generateFirst(table.state_set)
+    lrStateSet.generateLRProjects(table.state_set)
+    lrParser.encodeGrammar(lazy.encoded)
+    table.conflicts.clear()
+    lazy.kernels.clear()
+    lazy.kernel_index.clear()
+    lazy.rows.clear()
+    lazy.reported.clear()
+    lazy.statistics.clear()
+    lazy.statistics.update({'rows materialized': 0, 'rows evicted': 0, 'rows loaded': 0})
+    lazy.limit = row_limit
+    # S' -> S, $
+    discover(lrStateSet.kernelKey({(0, 0, table.state_set.grammar.symbol_ids[data.END])}), lazy)
+
+
+def discover(key: frozenset, lazy: LazyTable = None) -> int:
+    """
+    :return: id of the state with kernel key, a new id if the kernel was not seen before
+    """
+    lazy = lazy or default
+    kernel_index = lazy.kernel_index
+    if key not in kernel_index:
+        kernel_index[key] = len(lazy.kernels)
+        lazy.kernels.append(key)
+    return kernel_index[key]
+
+
+def materialize(state_id: int, lazy: LazyTable = None) -> tuple:
+    """
+    closure, ACTION row and GOTO row of a state, conflicts are settled like analyzeTable.generateAnalyzeTable()
+    :return: (ACTION row indexed by terminal id, GOTO row indexed by nonterminal id)
+    """
+    lazy = lazy or default
+    encoded = lazy.encoded
+    table = encoded.table
+    lr = table.state_set
+    grammar = lr.grammar
+    kernels = lazy.kernels
+    state = lrStateSet.State(state_id)
+    state.items = set(kernels[state_id])
+    lrStateSet.closure(state, lr)
+    # the closure is in state, keeping it in closure_cache too would defeat the row limit
+    lr.closure_cache.pop(kernels[state_id], None)
+
+    actions = dict()  # terminal -> action as in analyzeTable.action_table
+    recorded = len(table.conflicts)
+
+    def setAction(terminal, value):
+        old = actions.get(terminal, 0)
+        if old == analyzeTable.EXPLICIT_ERROR:
+            return
+        actions[terminal] = value if old == 0 or old == value else \
+            analyzeTable.resolve(state_id, terminal, old, value, table)
+
+    for production_rule_id, dot, look_forward in state.items:
+        if lr.project_by_core[(production_rule_id, dot)].reduce:
+            setAction(grammar.symbol_names[look_forward],
+                      'acc' if production_rule_id == 0 else 'r%d' % production_rule_id)
+    goto_row = array('i', [0] * len(encoded.n_terminal_ids))
+    next_items = lrStateSet.successors(state, lr)
+    for symbol in lrStateSet.orderedSymbols(grammar):
+        if symbol not in next_items:
+            continue
+        target = discover(lrStateSet.kernelKey(next_items[symbol]), lazy)
+        if symbol in grammar.terminal_set:
+            setAction(symbol, 's%d' % target)
+        else:
+            goto_row[encoded.n_terminal_ids[symbol]] = target
+
+    action_row = array('i', [0] * len(encoded.terminal_ids))
+    for terminal, value in actions.items():
+        action_row[encoded.terminal_ids[terminal]] = lrParser.encodeAction(value)
+    if state_id in lazy.reported:  # the row was evicted, its conflicts were recorded when it was first built
+        del table.conflicts[recorded:]
+    lazy.reported.add(state_id)
+    lazy.statistics['rows materialized'] += 1
+    return action_row, goto_row
+
+
+def row(state_id: int, lazy: LazyTable = None) -> tuple:
+    lazy = lazy or default
+    rows = lazy.rows
+    res = rows.get(state_id)
+    if res is None:
+        res = rows[state_id] = materialize(state_id, lazy)
+        if lazy.limit is not None and len(rows) > lazy.limit:
+            rows.popitem(last=False)
+            lazy.statistics['rows evicted'] += 1
+    elif lazy.limit is not None:
+        rows.move_to_end(state_id)
+    return res
+
+
+def actionOf(state: int, token: int, lazy: LazyTable = None) -> int:
+    return row(state, lazy)[0][token]
+
+
+def gotoOf(state: int, n_terminal: int, lazy: LazyTable = None) -> int:
+    return row(state, lazy)[1][n_terminal]
+
+
+def parse(tokens: list, lazy: LazyTable = None) -> list:
+    """
+    lrParser.parse() over the lazy table
+    :param tokens: terminal ids, END is appended automatically
+    :return: production rule ids in the order they are reduced
+    """
+    lazy = lazy or default
+
+    # closures rather than functools.partial, a keyword argument makes every lookup twice as slow
+    def action_of(state, token):
+        return row(state, lazy)[0][token]
+
+    def goto_of(state, n_terminal):
+        return row(state, lazy)[1][n_terminal]
+
+    return lrParser.parseWith(tokens, action_of, goto_of, lazy.encoded)
+
+
+def saveWarmCache(path: str, files: list = tableCache.GRAMMAR_FILES, lazy: LazyTable = None) -> None:
+    """
+    write the discovered kernels and the rows in memory, so the next start does not compute them again
+    the conflicts found so far go with them, a loaded row is not materialized again to record its own
+    """
+    lazy = lazy or default
+    warm = {'grammar': tableCache.grammarHash(files, 'lazy'), 'kernels': list(lazy.kernels), 'rows': dict(lazy.rows),
+            'reported': set(lazy.reported), 'conflicts': list(lazy.encoded.table.conflicts)}
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp, 'wb') as f:
+        pickle.dump(warm, f)
+    os.replace(tmp, path)
+
+
+def loadWarmCache(path: str, files: list = tableCache.GRAMMAR_FILES, lazy: LazyTable = None) -> bool:
+    """
+    call generateLazyTable() first
+    :return: False if the file is missing or was written for other grammar files
+    """
+    lazy = lazy or default
+    kernels = lazy.kernels
+    kernel_index = lazy.kernel_index
+    rows = lazy.rows
+    if not os.path.exists(path):
+        return False
+    with open(path, 'rb') as f:
+        warm = pickle.load(f)
+    if warm['grammar'] != tableCache.grammarHash(files, 'lazy'):
+        return False
+    kernels[:] = warm['kernels']
+    kernel_index.clear()
+    for state_id, key in enumerate(kernels):
+        kernel_index[key] = state_id
+    rows.clear()
+    for state_id, value in warm['rows'].items():
+        rows[state_id] = value
+        if lazy.limit is not None and len(rows) > lazy.limit:
+            rows.popitem(last=False)
+    lazy.reported.clear()
+    lazy.reported.update(warm['reported'])
+    lazy.encoded.table.conflicts[:] = warm['conflicts']
+    lazy.statistics['rows loaded'] = len(rows)
+    return True
+
+
+def outcome(parser, tokens: list):
+    try:
+        return parser(tokens)
+    except SyntaxError:
+        return None
+
+
+if __name__ == '__main__':
+    # python ./lazyTable.py [row limit]
+    import tempfile
+
+    import grammarGenerator
+
+    row_limit = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    synthetic = grammarGenerator.syntheticGrammar(n_terminals=16, n_n_terminals=40, alternatives=3, rhs_length=4,
+                                                  epsilon=0.1, recursion='mixed')
+    with tempfile.TemporaryDirectory() as directory:
+        grammars = [
+            ('bundled', tableCache.GRAMMAR_FILES, [lrParser.sampleProgram(1000)]),
+            ('statement', grammarGenerator.writeGrammar(os.path.join(directory, 'statement'),
+                                                        grammarGenerator.statementGrammar()),
+             [grammarGenerator.randomSentence(grammarGenerator.statementGrammar(), seed, 12) for seed in range(50)]),
+            ('synthetic', grammarGenerator.writeGrammar(os.path.join(directory, 'synthetic'), synthetic),
+             [grammarGenerator.randomSentence(synthetic, seed, 30) for seed in range(50)]),
+        ]
+        for name, files, inputs in grammars:
+            data.readSymbols(files[0], files[1])
+            data.readProductionRules(files[2])
+            data.readPrecedence(files[3])
+            start = time.perf_counter()
+            lrStateSet.generateLRStateSet()
+            analyzeTable.generateAnalyzeTable()
+            lrParser.encodeTables()
+            prepared = time.perf_counter() - start
+            inputs = [lrParser.tokenIds(tokens) for tokens in inputs]
+            expected = [outcome(lrParser.parse, tokens) for tokens in inputs]
+            print('%-10s full: %5d states  built in %7.1f ms' % (name, lrStateSet.length, prepared * 1000))
+
+            start = time.perf_counter()
+            generateLazyTable(row_limit)
+            prepared = time.perf_counter() - start
+            start = time.perf_counter()
+            assert [outcome(parse, tokens) for tokens in inputs] == expected
+            parsed = time.perf_counter() - start
+            print('%-10s lazy: %5d states  prepared in %5.1f ms, first parse of %d inputs %7.1f ms  %s' % (
+                name, len(default.kernels), prepared * 1000, len(inputs), parsed * 1000, default.statistics))
+
+            conflicts = list(analyzeTable.conflicts)
+            path = os.path.join(directory, name + '.warm')
+            saveWarmCache(path, files)
+            generateLazyTable(row_limit)
+            assert loadWarmCache(path, files)
+            start = time.perf_counter()
+            assert [outcome(parse, tokens) for tokens in inputs] == expected
+            assert analyzeTable.conflicts == conflicts
+            print('%-10s warm: first parse %7.1f ms  %s' % (name, (time.perf_counter() - start) * 1000,
+                                                            default.statistics))
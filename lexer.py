@@ -0,0 +1,449 @@
+import mmap
+import os
+import time
+from array import array
+
+import data
+import lrParser
+
+# a scanner generated from the terminals: the literal terminals (;, int, <=, ...) match themselves,
+# the terminals named in patterns.txt (ID, INTNUM, ...) match a regular expression
+# regular expressions: concatenation, |, *, +, ?, ( ), [a-z0-9_] and [^...] classes, . and \ escapes
+# sets of bytes are int bitmasks of 256 bits, like the sets of terminals in lrStateSet
+SKIP = -2  # token of white space, dropped by scan()
+NONE = -1  # not an accepting state
+WHITE_SPACE = '[ \t\r\n]+'
+ALL_BYTES = (1 << 256) - 1
+
+
+class Scanner:
+    """
+    the automaton of the terminals of an lrParser.EncodedTables, the functions below work on the default instance unless
+    given one, the module-level names, lexer.transitions and so on, are the attributes of the default instance
+    """
+    def __init__(self, encoded: lrParser.EncodedTables = None):
+        self.encoded = encoded or lrParser.default
+        # lists rather than arrays, indexing a list does not create an int object, scan() is twice as fast
+        # state offset + byte -> offset of the next state, -1 if there is none; offset = state * 256
+        self.transitions = []
+        self.accepting = []  # state offset -> token id, SKIP or NONE
+        self.start = 0  # offset of the start state
+
+
+default = Scanner()
+
+
+def __getattr__(name):
+    return getattr(default, name)
+
+
+def readPatterns(pattern_file: str) -> dict:
+    """
+    one terminal and its regular expression per line
+    ID [A-Za-z_][A-Za-z0-9_]*
+    """
+    res = dict()
+    with open(pattern_file) as f:
+        for line in f.readlines():
+            line = line.strip()
+            if len(line) == 0:
+                continue
+            terminal, pattern = line.split(None, 1)
+            res[terminal] = pattern
+    return res
+
+
+class NFA:
+    """
+    Thompson automaton, a fragment is (start state, end state)
+    """
+    def __init__(self):
+        self.edges = []  # state -> list of (bitmask of bytes, state)
+        self.eps = []  # state -> list of states
+        self.accept = dict()  # end state -> (priority, token), the lowest priority wins
+
+    def state(self) -> int:
+        self.edges.append([])
+        self.eps.append([])
+        return len(self.edges) - 1
+
+    def bytesFragment(self, mask: int) -> tuple:
+        s, e = self.state(), self.state()
+        self.edges[s].append((mask, e))
+        return s, e
+
+    def literal(self, text: bytes) -> tuple:
+        s = e = self.state()
+        for b in text:
+            t = self.state()
+            self.edges[e].append((1 << b, t))
+            e = t
+        return s, e
+
+    def concat(self, fragments: list) -> tuple:
+        if len(fragments) == 0:
+            s = self.state()
+            return s, s
+        for (s1, e1), (s2, e2) in zip(fragments, fragments[1:]):
+            self.eps[e1].append(s2)
+        return fragments[0][0], fragments[-1][1]
+
+    def alternative(self, fragments: list) -> tuple:
+        s, e = self.state(), self.state()
+        for fs, fe in fragments:
+            self.eps[s].append(fs)
+            self.eps[fe].append(e)
+        return s, e
+
+    def repeat(self, fragment: tuple, operator: str) -> tuple:
+        fs, fe = fragment
+        s, e = self.state(), self.state()
+        self.eps[s].append(fs)
+        self.eps[fe].append(e)
+        if operator in '*?':
+            self.eps[s].append(e)
+        if operator in '*+':
+            self.eps[fe].append(fs)
+        return s, e
+
+
+def parsePattern(nfa: NFA, pattern: str) -> tuple:
+    """
+    :return: fragment of nfa matching pattern
+    """
+    text = pattern.encode('utf-8')
+    position = 0
+
+    def peek():
+        return text[position] if position < len(text) else None
+
+    def take() -> int:
+        nonlocal position
+        if position >= len(text):
+            raise Exception('unexpected end of pattern %s' % pattern)
+        position += 1
+        return text[position - 1]
+
+    def characterClass() -> int:
+        negate = peek() == ord('^')
+        if negate:
+            take()
+        mask = 0
+        first = True
+        while peek() != ord(']') or first:
+            first = False
+            b = take()
+            if b == ord('\\'):
+                b = take()
+            if peek() == ord('-') and position + 1 < len(text) and text[position + 1] != ord(']'):
+                take()
+                end = take()
+                if end == ord('\\'):
+                    end = take()
+                for c in range(b, end + 1):
+                    mask |= 1 << c
+            else:
+                mask |= 1 << b
+        take()
+        return ALL_BYTES & ~mask if negate else mask
+
+    def atom() -> tuple:
+        b = take()
+        if b == ord('('):
+            res = alternative()
+            if take() != ord(')'):
+                raise Exception('missing ) in pattern %s' % pattern)
+            return res
+        if b == ord('['):
+            return nfa.bytesFragment(characterClass())
+        if b == ord('.'):
+            return nfa.bytesFragment(ALL_BYTES & ~(1 << ord('\n')))
+        if b == ord('\\'):
+            b = take()
+        return nfa.bytesFragment(1 << b)
+
+    def concatenation() -> tuple:
+        fragments = []
+        while peek() is not None and peek() not in b'|)':
+            fragment = atom()
+            while peek() is not None and peek() in b'*+?':
+                fragment = nfa.repeat(fragment, chr(take()))
+            fragments.append(fragment)
+        return nfa.concat(fragments)
+
+    def alternative() -> tuple:
+        fragments = [concatenation()]
+        while peek() == ord('|'):
+            take()
+            fragments.append(concatenation())
+        return fragments[0] if len(fragments) == 1 else nfa.alternative(fragments)
+
+    res = alternative()
+    if position != len(text):
+        raise Exception('unexpected %s in pattern %s' % (chr(text[position]), pattern))
+    return res
+
+
+def byteClasses(nfa: NFA) -> list:
+    """
+    bytes no edge of nfa tells apart share a class
+    :return: list of (bitmask of the bytes of the class, one byte of the class)
+    """
+    masks = {mask for edges in nfa.edges for mask, target in edges}
+    signatures = dict()  # tuple of the masks containing a byte -> bytes
+    for b in range(256):
+        signature = tuple(mask >> b & 1 for mask in masks)
+        signatures[signature] = signatures.get(signature, 0) | 1 << b
+    return [(mask, (mask & -mask).bit_length() - 1) for mask in signatures.values()]
+
+
+def epsClosure(nfa: NFA, states) -> frozenset:
+    res = set(states)
+    worklist = list(states)
+    while worklist:
+        s = worklist.pop()
+        for t in nfa.eps[s]:
+            if t not in res:
+                res.add(t)
+                worklist.append(t)
+    return frozenset(res)
+
+
+def subsetConstruction(nfa: NFA, nfa_start: int, classes: list) -> tuple:
+    """
+    :return: (dfa, accept), dfa[state][class] is the next state or -1, accept[state] the token or NONE, state 0 starts
+    """
+    start_set = epsClosure(nfa, [nfa_start])
+    ids = {start_set: 0}
+    sets = [start_set]
+    dfa = []
+    for states in sets:
+        row = []
+        for mask, b in classes:
+            targets = [t for s in states for edge_mask, t in nfa.edges[s] if edge_mask >> b & 1]
+            if len(targets) == 0:
+                row.append(-1)
+                continue
+            target = epsClosure(nfa, targets)
+            if target not in ids:
+                ids[target] = len(sets)
+                sets.append(target)
+            row.append(ids[target])
+        dfa.append(row)
+    accept = []
+    for states in sets:
+        accepted = [nfa.accept[s] for s in states if s in nfa.accept]
+        accept.append(min(accepted)[1] if accepted else NONE)
+    return dfa, accept
+
+
+def minimize(dfa: list, accept: list) -> tuple:
+    """
+    Moore's partition refinement, the dead state -1 stays outside the partition
+    :return: (dfa, accept) of the minimal automaton, state 0 still starts
+    """
+    block = accept[:]
+    while True:
+        signatures = dict()
+        new_block = []
+        for state, row in enumerate(dfa):
+            signature = (block[state], tuple(block[t] if t >= 0 else None for t in row))
+            new_block.append(signatures.setdefault(signature, len(signatures)))
+        if len(signatures) == len(set(block)):
+            block = new_block
+            break
+        block = new_block
+    # renumber so the block of the start state is 0
+    order = {block[0]: 0}
+    for b in block:
+        order.setdefault(b, len(order))
+    res = [None] * len(order)
+    res_accept = [NONE] * len(order)
+    for state, row in enumerate(dfa):
+        b = order[block[state]]
+        res[b] = [order[block[t]] if t >= 0 else -1 for t in row]
+        res_accept[b] = accept[state]
+    return res, res_accept
+
+
+def generateLexer(patterns: dict, terminal_ids: dict = None, scanner: Scanner = None) -> int:
+    """
+    build the scanner of the terminals of data, the tokens are the columns of the action table of lrParser
+    a literal terminal wins over a pattern matching the same text, so keywords are not ID; among patterns the first
+    listed wins; the longest match is always taken first
+    :param patterns: terminal -> regular expression, the terminals not in it are literals
+    :param terminal_ids: terminal -> token id, scanner.encoded.terminal_ids by default, call lrParser.encodeTables()
+    first
+    :return: number of states of the minimal automaton
+    """
+    scanner = scanner or default
+    terminal_ids = scanner.encoded.terminal_ids if terminal_ids is None else terminal_ids
+    nfa = NFA()
+    nfa_start = nfa.state()
+    priority = 0
+    for terminal in terminal_ids:
+        if terminal == data.END or terminal in patterns:
+            continue
+        s, e = nfa.literal(terminal.encode('utf-8'))
+        nfa.eps[nfa_start].append(s)
+        nfa.accept[e] = (priority, terminal_ids[terminal])
+        priority += 1
+    for terminal, pattern in list(patterns.items()) + [(None, WHITE_SPACE)]:
+        if terminal is not None and terminal not in terminal_ids:
+            print('pattern of %s, which is not a terminal' % terminal)
+            raise Exception
+        s, e = parsePattern(nfa, pattern)
+        nfa.eps[nfa_start].append(s)
+        nfa.accept[e] = (priority, SKIP if terminal is None else terminal_ids[terminal])
+        priority += 1
+
+    classes = byteClasses(nfa)
+    dfa, accept = minimize(*subsetConstruction(nfa, nfa_start, classes))
+
+    transitions = [-1] * (len(dfa) * 256)
+    accepting = [NONE] * (len(dfa) * 256)
+    for state, row in enumerate(dfa):
+        accepting[state * 256] = accept[state]
+        for (mask, b), target in zip(classes, row):
+            if target < 0:
+                continue
+            while mask:
+                low = mask & -mask
+                transitions[state * 256 + low.bit_length() - 1] = target * 256
+                mask ^= low
+    scanner.transitions = transitions
+    scanner.accepting = accepting
+    scanner.start = 0
+    return len(dfa)
+
+
+def scan(buffer, scanner: Scanner = None) -> array:
+    """
+    one pass over the bytes, a token ends where the automaton has no transition
+    that is the longest match unless the automaton stops in a state that does not accept (patterns a and abc reading
+    abd), then or on an error the whole buffer is scanned again by scanLongest()
+    :param buffer: bytes, bytearray or memoryview of the source, memoryview(mmap) for a mapped file
+    :return: token ids, white space dropped, END not appended (parse() does it)
+    """
+    scanner = scanner or default
+    transitions_ = scanner.transitions
+    accepting_ = scanner.accepting
+    start_ = scanner.start
+    tokens = array('i')
+    append = tokens.append
+    state = start_
+    for b in buffer:
+        next_state = transitions_[state + b]
+        if next_state < 0:
+            token = accepting_[state]
+            if token == NONE:
+                return scanLongest(buffer, scanner)
+            if token != SKIP:
+                append(token)
+            next_state = transitions_[start_ + b]
+            if next_state < 0:
+                return scanLongest(buffer, scanner)
+        state = next_state
+    if state != start_:
+        token = accepting_[state]
+        if token == NONE:
+            return scanLongest(buffer, scanner)
+        if token != SKIP:
+            append(token)
+    return tokens
+
+
+def scanLongest(buffer, scanner: Scanner = None) -> array:
+    """
+    scan() going back to the last accepting state when the automaton stops, slower but exact in every case
+    """
+    scanner = scanner or default
+    transitions_ = scanner.transitions
+    accepting_ = scanner.accepting
+    start_ = scanner.start
+    tokens = array('i')
+    append = tokens.append
+    n = len(buffer)
+    i = 0
+    while i < n:
+        state = start_
+        j = i
+        token = NONE
+        end = i
+        while j < n:
+            state = transitions_[state + buffer[j]]
+            if state < 0:
+                break
+            j += 1
+            if accepting_[state] != NONE:
+                token = accepting_[state]
+                end = j
+        if token == NONE:
+            raise SyntaxError('unexpected %r at byte %d' % (bytes(buffer[i:i + 1]), i))
+        if token != SKIP:
+            append(token)
+        i = end
+    return tokens
+
+
+def scanFile(path: str, scanner: Scanner = None) -> array:
+    """
+    scan a file mapped into memory, it is not read into a bytes object first
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return array('i')
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer, memoryview(buffer) as view:
+            return scan(view, scanner)
+
+
+def sampleSource(n: int) -> bytes:
+    """
+    source text of lrParser.sampleProgram(n), with lexemes in place of ID, INTNUM and REALNUM
+    """
+    lexemes = {'ID': ['x', 'count', 'int1', 'iffy', 'total_sum'], 'INTNUM': ['0', '42', '123456'],
+               'REALNUM': ['3.14', '0.5', '100.25']}
+    res = []
+    for i, token in enumerate(lrParser.sampleTokens(n)):
+        res.append(lexemes[token][i % len(lexemes[token])] if token in lexemes else token)
+        res.append('\n' if token in [';', '{', '}'] else ' ')
+    return ''.join(res).encode('utf-8')
+
+
+if __name__ == '__main__':
+    import tempfile
+
+    import analyzeTable
+    import lrStateSet
+
+    data.readData()
+    lrStateSet.generateLRStateSet()
+    analyzeTable.generateAnalyzeTable()
+    lrParser.encodeTables()
+    patterns = readPatterns('./data/patterns.txt')
+    print('lexer states: %d' % generateLexer(patterns))
+
+    source = sampleSource(20000)
+    expected = lrParser.tokenIds(lrParser.sampleProgram(20000))
+    repeat = 3
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        tokens = scan(source)
+    seconds = (time.perf_counter() - start_time) / repeat
+    assert list(tokens) == expected
+    assert len(lrParser.parse(tokens)) > 0
+    print('bytes: %d  tokens: %d' % (len(source), len(tokens)))
+    print('dfa:   %.2f MB/s' % (len(source) / seconds / 1e6))
+    start_time = time.perf_counter()
+    assert list(scanLongest(source)) == expected
+    print('dfa going back to the last accepting state: %.2f MB/s' % (
+        len(source) / (time.perf_counter() - start_time) / 1e6))
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'source.txt')
+        with open(path, 'wb') as f:
+            f.write(source)
+        start_time = time.perf_counter()
+        assert list(scanFile(path)) == expected
+        print('mmap:  %.2f MB/s' % (len(source) / (time.perf_counter() - start_time) / 1e6))
+
@@ -0,0 +1,378 @@
+import functools
+import sys
+import time
+from array import array
+
+import analyzeTable
+import data
+import lalrStateSet
+import lrStateSet
+
+# an encoded action keeps its kind in the low 2 bits and the state or production rule id in the others
+ERROR = 0
+SHIFT = 1
+REDUCE = 2
+ACCEPT = 3
+EXPLICIT_ERROR = 1 << 2 | ERROR  # analyzeTable.EXPLICIT_ERROR, an error too, but compressTable gives its row no default
+
+
+class EncodedTables:
+    """
+    the tables of an AnalyzeTable as flat int arrays, the functions below work on the default instance unless given
+    one, the module-level names, lrParser.action and so on, are the attributes of the default instance
+    """
+    def __init__(self, table: analyzeTable.AnalyzeTable = None):
+        self.table = table or analyzeTable.default
+        self.terminal_ids = dict()  # terminal -> column of action, END is the last one
+        self.n_terminal_ids = dict()  # nonterminal -> column of goto
+        self.action = array('i')  # state * len(terminal_ids) + terminal id -> encoded action
+        self.goto = array('i')  # state * len(n_terminal_ids) + nonterminal id -> state
+        self.production_length = array('i')  # production rule id -> number of symbols on its right side
+        self.production_left = array('i')  # production rule id -> nonterminal id of its left side
+
+
+default = EncodedTables()
+
+
+def __getattr__(name):
+    return getattr(default, name)
+
+
+def encodeAction(value) -> int:
+    """
+    0 -> ERROR, 'err' -> EXPLICIT_ERROR, 'acc' -> ACCEPT, 's12' -> 12 << 2 | SHIFT, 'r3' -> 3 << 2 | REDUCE
+    """
+    if value == 0:
+        return ERROR
+    if value == analyzeTable.EXPLICIT_ERROR:
+        return EXPLICIT_ERROR
+    if value == 'acc':
+        return ACCEPT
+    if value[0] == 's':
+        return int(value[1:]) << 2 | SHIFT
+    return int(value[1:]) << 2 | REDUCE
+
+
+def encodeGrammar(encoded: EncodedTables = None) -> None:
+    """
+    number the terminals and nonterminals, and fill production_length and production_left
+    """
+    encoded = encoded or default
+    grammar = encoded.table.state_set.grammar
+    terminal_ids = encoded.terminal_ids
+    n_terminal_ids = encoded.n_terminal_ids
+    terminal_ids.clear()
+    n_terminal_ids.clear()
+    for terminal in grammar.terminals:
+        if terminal == data.EPS or terminal in terminal_ids:  # a terminal can be listed twice in terminals.txt
+            continue
+        terminal_ids[terminal] = len(terminal_ids)
+    terminal_ids[data.END] = len(terminal_ids)
+    for n_terminal in grammar.n_terminals:
+        if n_terminal not in n_terminal_ids:
+            n_terminal_ids[n_terminal] = len(n_terminal_ids)
+
+    production_length = array('i', [0] * len(grammar.production_rule_list))
+    production_left = array('i', [0] * len(grammar.production_rule_list))
+    for production_rule in grammar.production_rule_list:
+        if production_rule.right != [data.EPS]:
+            production_length[production_rule.id] = len(production_rule.right)
+        production_left[production_rule.id] = n_terminal_ids[production_rule.left]
+    encoded.production_length = production_length
+    encoded.production_left = production_left
+
+
+def encodeTables(encoded: EncodedTables = None) -> None:
+    """
+    encode the action_table and goto_table of encoded.table as flat int arrays
+    call analyzeTable.generateAnalyzeTable() first
+    """
+    encoded = encoded or default
+    encodeGrammar(encoded)
+    terminal_ids = encoded.terminal_ids
+    n_terminal_ids = encoded.n_terminal_ids
+    action_table = encoded.table.action_table
+    goto_table = encoded.table.goto_table
+    action = array('i', [0] * (len(action_table) * len(terminal_ids)))
+    for state_id, row in enumerate(action_table):
+        for terminal, column in terminal_ids.items():
+            action[state_id * len(terminal_ids) + column] = encodeAction(row[terminal])
+    goto = array('i', [0] * (len(goto_table) * len(n_terminal_ids)))
+    for state_id, row in enumerate(goto_table):
+        for n_terminal, column in n_terminal_ids.items():
+            goto[state_id * len(n_terminal_ids) + column] = row[n_terminal]
+    encoded.action = action
+    encoded.goto = goto
+
+
+def tokenIds(tokens: list, encoded: EncodedTables = None) -> list:
+    """
+    terminal names -> terminal ids used by parse()
+    """
+    terminal_ids = (encoded or default).terminal_ids
+    return [terminal_ids[token] for token in tokens]
+
+
+def actionOf(state: int, token: int, encoded: EncodedTables = None) -> int:
+    encoded = encoded or default
+    return encoded.action[state * len(encoded.terminal_ids) + token]
+
+
+def gotoOf(state: int, n_terminal: int, encoded: EncodedTables = None) -> int:
+    encoded = encoded or default
+    return encoded.goto[state * len(encoded.n_terminal_ids) + n_terminal]
+
+
+def reductionsEnd(stack: list, token: int, action_of, goto_of, encoded: EncodedTables = None) -> bool:
+    """
+    follow the reductions on token from stack, without changing it, until token is shifted, accepted or an error
+    the tables of a grammar whose conflicts were settled can reduce forever without reading token, like
+    N1 -> EPS and N2 -> EPS pushing each other's states
+    a reduction reads the state it pops down to and pushes one on it; if the same two states come back at a
+    height the stack has not been popped below since, the same reductions repeat from them forever; the pair looked
+    for is taken again at every power of 2 reductions, so a cycle that does not start at the first one is found too
+    :return: False if the reductions never end
+    """
+    encoded = encoded or default
+    production_length = encoded.production_length
+    production_left = encoded.production_left
+    base = len(stack)  # stack[:base] is not changed by the reductions followed so far
+    pushed = []  # states above stack[:base]
+    mark = None  # (state read, state pushed) of the reduction looked for
+    mark_floor = len(stack)  # height the stack has not been popped below since mark
+    steps = 0
+    while True:
+        value = action_of(pushed[-1] if pushed else stack[base - 1], token)
+        if value & 3 != REDUCE:
+            return True
+        production_rule_id = value >> 2
+        length = production_length[production_rule_id]
+        if length > len(pushed):
+            base -= length - len(pushed)
+            pushed.clear()
+        elif length:
+            del pushed[-length:]
+        floor = base + len(pushed)
+        below = pushed[-1] if pushed else stack[base - 1]
+        pushed.append(goto_of(below, production_left[production_rule_id]))
+        steps += 1
+        if floor < mark_floor or steps & (steps - 1) == 0:
+            mark, mark_floor = (below, pushed[-1]), floor
+        elif mark == (below, pushed[-1]):
+            return False
+
+
+def parse(tokens: list, encoded: EncodedTables = None) -> list:
+    """
+    shift-reduce loop over the encoded tables
+    :param tokens: terminal ids, END is appended automatically
+    :return: production rule ids in the order they are reduced
+    """
+    encoded = encoded or default
+    action_ = encoded.action
+    goto_ = encoded.goto
+    length_ = encoded.production_length
+    left_ = encoded.production_left
+    width = len(encoded.terminal_ids)
+    goto_width = len(encoded.n_terminal_ids)
+    end = encoded.terminal_ids[data.END]
+    limit = len(action_) // width  # reductions in a row after which reductionsEnd() checks that they end
+
+    reductions = []
+    stack = [0]
+    n = len(tokens)
+    i = 0
+    run = 0  # reductions since the last shift
+    token = tokens[0] if n > 0 else end
+    while True:
+        value = action_[stack[-1] * width + token]
+        kind = value & 3
+        if kind == SHIFT:
+            stack.append(value >> 2)
+            i += 1
+            token = tokens[i] if i < n else end
+            run = 0
+        elif kind == REDUCE:
+            production_rule_id = value >> 2
+            length = length_[production_rule_id]
+            if length:
+                del stack[-length:]
+            stack.append(goto_[stack[-1] * goto_width + left_[production_rule_id]])
+            reductions.append(production_rule_id)
+            run += 1
+            if run == limit and not reductionsEnd(stack, token, functools.partial(actionOf, encoded=encoded),
+                                                  functools.partial(gotoOf, encoded=encoded), encoded):
+                raise SyntaxError('endless reductions on token %d at position %d in state %d' % (token, i, stack[-1]))
+        elif kind == ACCEPT:
+            return reductions
+        else:
+            raise SyntaxError('unexpected token %d at position %d in state %d' % (token, i, stack[-1]))
+
+
+def parseWith(tokens: list, action_of, goto_of, encoded: EncodedTables = None) -> list:
+    """
+    the loop of parse() with lookups done through action_of(state, token) and goto_of(state, nonterminal),
+    so other table layouts with the same accessors can be used
+    :param encoded: where the terminal ids and production rules come from
+    """
+    encoded = encoded or default
+    production_length = encoded.production_length
+    production_left = encoded.production_left
+    end = encoded.terminal_ids[data.END]
+    limit = len(production_length)  # the number of states is not known here
+    reductions = []
+    stack = [0]
+    n = len(tokens)
+    i = 0
+    run = 0  # reductions since the last shift
+    token = tokens[0] if n > 0 else end
+    while True:
+        value = action_of(stack[-1], token)
+        kind = value & 3
+        if kind == SHIFT:
+            stack.append(value >> 2)
+            i += 1
+            token = tokens[i] if i < n else end
+            run = 0
+        elif kind == REDUCE:
+            production_rule_id = value >> 2
+            length = production_length[production_rule_id]
+            if length:
+                del stack[-length:]
+            stack.append(goto_of(stack[-1], production_left[production_rule_id]))
+            reductions.append(production_rule_id)
+            run += 1
+            if run == limit and not reductionsEnd(stack, token, action_of, goto_of, encoded):
+                raise SyntaxError('endless reductions on token %d at position %d in state %d' % (token, i, stack[-1]))
+        elif kind == ACCEPT:
+            return reductions
+        else:
+            raise SyntaxError('unexpected token %d at position %d in state %d' % (token, i, stack[-1]))
+
+
+class PushParser:
+    """
+    parse tokens pushed one at a time, only the LR stack is kept
+    every push returns the events it caused: (REDUCE, production rule id) for each reduction, then (SHIFT, token)
+    """
+    def __init__(self, encoded: EncodedTables = None):
+        self.encoded = encoded or default
+        self.stack = [0]
+        self.position = 0  # number of tokens shifted
+        self.accepted = False
+
+    def push(self, token: int) -> list:
+        """
+        :param token: terminal id, push terminal_ids[END] or call finish() at the end of the input
+        :return: events
+        """
+        assert not self.accepted
+        encoded = self.encoded
+        action = encoded.action
+        stack = self.stack
+        width = len(encoded.terminal_ids)
+        limit = len(action) // width  # reductions in a row after which reductionsEnd() checks that they end
+        run = 0
+        events = []
+        while True:
+            value = action[stack[-1] * width + token]
+            kind = value & 3
+            if kind == SHIFT:
+                stack.append(value >> 2)
+                self.position += 1
+                events.append((SHIFT, token))
+                return events
+            elif kind == REDUCE:
+                production_rule_id = value >> 2
+                length = encoded.production_length[production_rule_id]
+                if length:
+                    del stack[-length:]
+                stack.append(encoded.goto[stack[-1] * len(encoded.n_terminal_ids) +
+                                          encoded.production_left[production_rule_id]])
+                events.append((REDUCE, production_rule_id))
+                run += 1
+                if run == limit and not reductionsEnd(stack, token, functools.partial(actionOf, encoded=encoded),
+                                                      functools.partial(gotoOf, encoded=encoded), encoded):
+                    raise SyntaxError('endless reductions on token %d at position %d in state %d' % (
+                        token, self.position, stack[-1]))
+            elif kind == ACCEPT:
+                self.accepted = True
+                events.append((ACCEPT, 0))
+                return events
+            else:
+                raise SyntaxError('unexpected token %d at position %d in state %d' % (token, self.position, stack[-1]))
+
+    def finish(self) -> list:
+        """
+        end of the input
+        :return: the remaining events, the last one is (ACCEPT, 0)
+        """
+        return self.push(self.encoded.terminal_ids[data.END])
+
+
+def parseStream(tokens, encoded: EncodedTables = None):
+    """
+    parse an iterator of terminal ids lazily
+    :return: iterator of the events of PushParser, tokens are read only when the parser needs them
+    """
+    parser = PushParser(encoded)
+    for token in tokens:
+        yield from parser.push(token)
+    yield from parser.finish()
+
+
+def sampleTokens(n: int):
+    """
+    terminal names of a program of the bundled grammar with n statements in its compound statement, one at a time
+    """
+    yield from ['int', 'ID', '=', 'INTNUM', ';', 'real', 'ID', '=', 'REALNUM', ';', '{']
+    statements = [
+        ['ID', '=', 'ID', '+', 'INTNUM', '*', '(', 'ID', '-', 'REALNUM', ')', ';'],
+        ['if', '(', 'ID', '<=', 'INTNUM', ')', 'then', 'ID', '=', 'ID', '/', 'INTNUM', ';',
+         'else', '{', 'ID', '=', 'INTNUM', ';', '}'],
+        ['{', 'ID', '=', 'ID', '*', 'ID', ';', '}'],
+    ]
+    for i in range(n):
+        yield from statements[i % len(statements)]
+    yield '}'
+
+
+def sampleProgram(n: int) -> list:
+    """
+    terminal names of a program of the bundled grammar with n statements in its compound statement
+    """
+    return list(sampleTokens(n))
+
+
+if __name__ == '__main__':
+    data.readData()
+    if 'lalr' in sys.argv[1:]:
+        lalrStateSet.generateLALRStateSet()
+    else:
+        lrStateSet.generateLRStateSet()
+    analyzeTable.generateAnalyzeTable()
+    encodeTables()
+
+    tokens = tokenIds(sampleProgram(10000))
+    repeat = 5
+    start = time.perf_counter()
+    for _ in range(repeat):
+        reductions = parse(tokens)
+    seconds = time.perf_counter() - start
+    print('states: %d' % lrStateSet.length)
+    print('tokens: %d  reductions: %d' % (len(tokens), len(reductions)))
+    print('tokens per second: %.0f' % (len(tokens) * repeat / seconds))
+
+    # streaming: tokens are generated while parsing, only the LR stack is kept
+    for n in [10000, 100000]:
+        parser = PushParser()
+        depth = 0
+        events = 0
+        start = time.perf_counter()
+        for token in sampleTokens(n):
+            events += len(parser.push(default.terminal_ids[token]))
+            depth = max(depth, len(parser.stack))
+        events += len(parser.finish())
+        seconds = time.perf_counter() - start
+        print('stream of %d statements: %d events  max stack depth: %d  tokens per second: %.0f'
+              % (n, events, depth, parser.position / seconds))
@@ -1,21 +1,89 @@
-import copy
+import functools
+import gc
+import multiprocessing
+from array import array
+from collections import deque
+
 import data
+import instrument
+
+
+class StateSet:
+    """
+    first, the projects and the LR(1) states of a grammar, the functions below work on the default instance
+    unless given one, the module-level names, lrStateSet.first and so on, are the attributes of the default instance
+    """
+    def __init__(self, grammar: data.Grammar = None):
+        self.grammar = grammar or data.default
+        # sets of terminals are bitmasks: bit i is set when the symbol with data.symbol_ids == i is in the set
+        self.first = dict()  # str -> bitmask of terminals
+        self.eps_bit = 0  # bitmask of {EPS}
+        self.nullable_symbols = set()  # nonterminals that derive epsilon
+        # (production rule id, dot, look_forward) -> first of the symbols after next_symbol and look_forward
+        self.first_cache = dict()
+        self.closure_cache = dict()  # kernel key -> items of its closure
+
+        self.lr_projects = set()
+        # indexes of lr_projects, filled by initLRProjects
+        self.lr_project_list = []  # LRProject.id -> LRProject
+        self.project_by_core = dict()  # (production rule id, dot) -> LRProject
+        self.projects_by_left = dict()  # (left, dot) -> list of LRProject
+        self.initial_items = dict()  # nonterminal A -> list of (production rule id, 0), the cores of A -> · c
+
+        self.state_set = set()  # set of State
+        self.state_list = []  # State.id -> State
+        self.length = 0  # len(state_set)
+
+
+default = StateSet()
+forked = dict()  # id -> StateSet used by the worker processes of parallelItems(), which are forked with it
+ITEM_BYTES = 3 * array('i').itemsize  # size of an item packed by packItems()
+
+
+def __getattr__(name):
+    return getattr(default, name)
+
+
+def symbolsToBits(symbols, grammar: data.Grammar = None) -> int:
+    symbol_ids = (grammar or data.default).symbol_ids
+    bits = 0
+    for symbol in symbols:
+        bits |= 1 << symbol_ids[symbol]
+    return bits
 
-first = dict()  # str -> set of str
+
+def bitsToIds(bits: int) -> list:
+    """
+    symbol ids of the set bits, from the lowest
+    """
+    res = []
+    while bits:
+        low = bits & -bits
+        res.append(low.bit_length() - 1)
+        bits ^= low
+    return res
+
+
+def bitsToSymbols(bits: int, grammar: data.Grammar = None) -> list:
+    symbol_names = (grammar or data.default).symbol_names
+    return [symbol_names[i] for i in bitsToIds(bits)]
 
 
 # compute first
-def initFirst() -> None:
-    for symbol in data.symbols:
-        first[symbol] = set()
+def initFirst(lr: StateSet = None) -> None:
+    lr = lr or default
+    lr.eps_bit = symbolsToBits([data.EPS], lr.grammar)
+    for symbol in lr.grammar.symbols:
+        lr.first[symbol] = 0
 
 
-def showFirst() -> None:
-    for k in first:
+def showFirst(lr: StateSet = None) -> None:
+    lr = lr or default
+    for k in lr.first:
         if k == data.EPS:
             print('EPS', end=' ')
         print(k, end=' [ ')
-        for f in first[k]:
+        for f in bitsToSymbols(lr.first[k], lr.grammar):
             if f == data.EPS:
                 print('EPS', end=' ')
                 continue
@@ -23,83 +91,179 @@ def showFirst() -> None:
         print(']')
 
 
-def generateFirst() -> None:
+def digraph(nodes: list, edges: dict, initial: dict) -> dict:
     """
-    compute first of every symbol and store them in a set called first
+    F(x) = initial(x) | union of F(y) for every x -> y in edges
+    every strongly connected component is visited once, and all its nodes share one value
+    F values are combined with |, so they can be sets or bitmasks, initial is never modified
     """
-    initFirst()
-    while True:
-        unchanged = True  # repeat until no more elements are added to any first set
-        for symbol in data.symbols:
-            if symbol in data.terminals:
-                if symbol not in first[symbol]:
-                    unchanged = False
-                first[symbol].add(symbol)
-                continue
-            if data.haveDirectEmptyProductionRule(symbol):
-                if data.EPS not in first[symbol]:
-                    unchanged = False
-                first[symbol].add(data.EPS)
-            if symbol in data.n_terminals:  # X -> Y1 Y2 ... Yk
-                for production_rule in data.production_rules[symbol]:
-                    all_EPS = True  # if forall i from 1 to k, first(Yi) contains epsilon, then add epsilon to first(X)
-                    for right in production_rule.right:  # Yi
-                        first_right = copy.deepcopy(first[right])  # deepcopy first(Yi) as first_Yi
-                        try:
-                            first_right.remove(data.EPS)  # remove epsilon from first_Yi
-                        except KeyError:
-                            pass
-                        if len(first[symbol] | first_right) != len(first[symbol]):  # | means Union
-                            unchanged = False
-                        first[symbol] = first[symbol] | first_right
-                        if data.EPS not in first[right]:  # whether first(Yi) contains epsilon
-                            all_EPS = False
-                            break
-
-                    if all_EPS:
-                        if data.EPS not in first[symbol]:
-                            unchanged = False
-                        first[symbol].add(data.EPS)
-        if unchanged:
-            break
+    res = dict()
+    depth = dict()
+    stack = []
+
+    def traverse(x):
+        stack.append(x)
+        d = len(stack)
+        depth[x] = d
+        res[x] = initial[x]
+        for y in edges.get(x, ()):
+            if y not in depth:
+                traverse(y)
+            depth[x] = min(depth[x], depth[y])
+            res[x] = res[x] | res[y]
+        if depth[x] == d:  # x is the root of a strongly connected component
+            if instrument.enabled:
+                instrument.add('digraph components')
+            while True:
+                y = stack.pop()
+                depth[y] = float('inf')
+                res[y] = res[x]
+                if y == x:
+                    break
+
+    for x in nodes:
+        if x not in depth:
+            traverse(x)
+    return res
+
 
+def nullableSymbols(grammar: data.Grammar = None) -> set:
+    """
+    the nonterminals that derive epsilon
+    every symbol on the right side of a production rule is visited once
+    """
+    nullable_symbols = set()
+    remaining = dict()  # production rule id -> number of symbols on its right side not known to be nullable
+    occurrences = dict()  # symbol -> production rules with it on the right side
+    worklist = []
+    for production_rule in data.liveProductionRules(grammar):
+        right = [r for r in production_rule.right if r != data.EPS]
+        remaining[production_rule.id] = len(right)
+        for r in right:
+            occurrences.setdefault(r, []).append(production_rule)
+        if len(right) == 0 and production_rule.left not in nullable_symbols:
+            nullable_symbols.add(production_rule.left)
+            worklist.append(production_rule.left)
+
+    while worklist:
+        symbol = worklist.pop()
+        for production_rule in occurrences.get(symbol, ()):
+            remaining[production_rule.id] -= 1
+            if remaining[production_rule.id] == 0 and production_rule.left not in nullable_symbols:
+                nullable_symbols.add(production_rule.left)
+                worklist.append(production_rule.left)
+    if instrument.enabled:
+        instrument.add('nullable worklist steps', len(nullable_symbols))  # every nullable symbol is popped once
+    return nullable_symbols
+
+
+def generateNullable(lr: StateSet = None) -> None:
+    """
+    compute the nonterminals that derive epsilon and store them in nullable_symbols
+    """
+    lr = lr or default
+    lr.nullable_symbols.clear()
+    lr.nullable_symbols.update(nullableSymbols(lr.grammar))
 
-def firstOfSymbols(symbol_seq: list) -> set:
+
+@instrument.timed('generateFirst')
+def generateFirst(lr: StateSet = None) -> None:
+    """
+    compute first of every symbol and store them in a set called first
+    X -> Y1 Y2 ... Yk: first(X) contains first(Yi) if Y1 ... Yi-1 are nullable
+    these dependencies are solved once in the order of the strongly connected components
+    """
+    lr = lr or default
+    grammar = lr.grammar
+    first = lr.first
+    nullable_symbols = lr.nullable_symbols
+    initFirst(lr)
+    lr.first_cache.clear()
+    lr.closure_cache.clear()
+    generateNullable(lr)
+
+    direct = dict()  # X -> terminals that can begin X directly
+    depends = dict()  # X -> Yi whose first is contained in first(X)
+    for n_terminal in grammar.n_terminals:
+        direct[n_terminal] = 0
+        depends[n_terminal] = []
+    for production_rule in data.liveProductionRules(grammar):
+        for right in production_rule.right:  # Yi
+            if right == data.EPS:
+                break
+            if right in grammar.terminal_set:
+                direct[production_rule.left] |= symbolsToBits([right], grammar)
+                break
+            depends[production_rule.left].append(right)
+            if right not in nullable_symbols:
+                break
+    first_n_terminals = digraph(grammar.n_terminals, depends, direct)
+
+    for terminal in grammar.terminals:
+        first[terminal] = symbolsToBits([terminal], grammar)
+    for n_terminal in grammar.n_terminals:
+        first[n_terminal] = first_n_terminals[n_terminal]
+        if n_terminal in nullable_symbols:
+            first[n_terminal] |= lr.eps_bit
+
+
+def firstOfSymbols(symbol_seq: list, lr: StateSet = None) -> int:
     """
     compute first of symbol_seq based on the set first
     :param symbol_seq: a list of nonterminals and terminals, for example ABc
-    :return: result of first(ABc)
+    :return: result of first(ABc) as a bitmask
     """
+    lr = lr or default
+    first = lr.first
+    eps_bit = lr.eps_bit
     assert len(symbol_seq) > 0
-    res = set()
-    if symbol_seq[0] == data.END:  # take $ into consideration
-        res.add(data.END)
-        return res
-
+    res = 0
     all_EPS = True
     for symbol in symbol_seq:
-        if symbol == data.END:
-            continue
-        first_symbol = copy.deepcopy(first[symbol])
-        try:
-            first_symbol.remove(data.EPS)
-        except KeyError:
-            pass
-        res = res | first_symbol
-        if data.EPS not in first[symbol]:
+        if symbol == data.END:  # take $ into consideration
+            res |= symbolsToBits([data.END], lr.grammar)
+            all_EPS = False
+            break
+        res |= first[symbol]
+        if not first[symbol] & eps_bit:
             all_EPS = False
             break
 
+    res &= ~eps_bit
     if all_EPS:
-        res.add(data.EPS)
+        res |= eps_bit
 
     return res
 
 
+def firstOfRest(production_rule_id: int, dot: int, look_forward: int, lr: StateSet = None) -> int:
+    """
+    first(bL) for the item A -> a · Bb, L, memoized in first_cache
+    :param look_forward: symbol id of L
+    :return: bitmask
+    """
+    lr = lr or default
+    first_cache = lr.first_cache
+    key = (production_rule_id, dot, look_forward)
+    if key not in first_cache:
+        if instrument.enabled:
+            instrument.add('sequence first computed')
+        symbol_seq = lr.project_by_core[(production_rule_id, dot)].restSymbols()  # [b]
+        symbol_seq.append(lr.grammar.symbol_names[look_forward])  # [b, L]
+        first_cache[key] = firstOfSymbols(symbol_seq, lr)
+    return first_cache[key]
+
+
 ########################################################################################################################
 # compute project(or item) set
 class LRProject:
-    def __init__(self, id: int, production_rule: data.ProductionRule):
+    """
+    LR(0) core of an item: a production rule and the position of ·
+    cores are created once by initLRProjects and never copied, items refer to them by (production rule id, dot)
+    """
+    __slots__ = ('id', 'production_rule_id', 'left', 'right', 'dot', 'reduce', 'equivalence', 'goto')
+
+    def __init__(self, id: int, production_rule: data.ProductionRule, dot: int = 0):
         """
         transfer a production rule to a LRProject
         A -> ·abB
@@ -110,18 +274,31 @@ class LRProject:
         self.id = id
         self.production_rule_id = production_rule.id  # store the production rule id of which generates this project
         self.left = production_rule.left
-        self.queue = []
         if production_rule.right == [data.EPS]:
-            self.out_queue = []
+            self.right = []
         else:
-            self.out_queue = production_rule.right
+            self.right = production_rule.right  # shared with production_rule, never modified
+        self.dot = dot  # position of ·
         self.reduce = False
         self.checkReduce()  # not a reduce project
         self.equivalence = set()  # first level identical LRProject.id
         self.goto = dict()  # X -> LRProject.id  goto LRProject.id when the input is X, where X here is nextSymbol()
-        self.look_forward = data.END  # initialize look_forward as END, will be modified later
 
-    def generateEquivalence(self) -> None:
+    @property
+    def queue(self) -> list:
+        """
+        symbols before ·
+        """
+        return self.right[:self.dot]
+
+    @property
+    def out_queue(self) -> list:
+        """
+        symbols after ·
+        """
+        return self.right[self.dot:]
+
+    def generateEquivalence(self, lr: StateSet = None) -> None:
         """
         generate first level identical project
         id:0 A -> · Ba  equivalence = {1, 3}
@@ -131,51 +308,23 @@ class LRProject:
         """
         if self.reduce:  # reduce projects do not have equivalent projects
             return
-        next_symbol = self.out_queue[0]
-        if next_symbol in data.terminals:
+        lr = lr or default
+        next_symbol = self.nextSymbol()
+        if next_symbol in lr.grammar.terminal_set:
             return
-        if next_symbol in data.n_terminals:
-            for lr_project in lr_projects:
-                # equivalent projects are those start with · so their queue is empty
-                if lr_project.left == next_symbol and lr_project.queue == []:
-                    self.equivalence.add(lr_project.id)
+        if next_symbol in lr.grammar.n_terminal_set:
+            # equivalent projects are those start with · so their queue is empty
+            for lr_project in lr.projects_by_left.get((next_symbol, 0), ()):
+                self.equivalence.add(lr_project.id)
 
-    def generateGoto(self) -> None:
+    def generateGoto(self, lr: StateSet = None) -> None:
         if self.reduce:  # reduce projects do not have goto projects
             return
+        lr = lr or default
         # A -> a · Bb
-        queue = copy.deepcopy(self.queue)  # queue = [a]
-        out_queue = copy.deepcopy(self.out_queue)  # out_queue = [B, b]
-        next_symbol = out_queue.pop(0)  # B
-        queue.append(next_symbol)  # queue = [a, B]  out_queue = [b] => A -> aB · b
-        for lr_project in lr_projects:
-            # find lr_project that meet requirements
-            if lr_project.left != self.left:
-                continue
-            if len(lr_project.queue) != len(queue):
-                continue
-            else:
-                equal = True
-                for i in range(len(queue)):
-                    if lr_project.queue[i] != queue[i]:
-                        equal = False
-                        break
-
-                if not equal:
-                    continue
-            if len(lr_project.out_queue) != len(out_queue):
-                continue
-            else:
-                equal = True
-                for i in range(len(out_queue)):
-                    if lr_project.out_queue[i] != out_queue[i]:
-                        equal = False
-                        break
-                if not equal:
-                    continue
-
-            self.goto[next_symbol] = lr_project.id
-            break
+        next_symbol = self.nextSymbol()  # B
+        # A -> aB · b comes from the same production rule with · moved right
+        self.goto[next_symbol] = lr.project_by_core[(self.production_rule_id, self.dot + 1)].id
 
     def nextSymbol(self) -> str:
         """
@@ -184,7 +333,7 @@ class LRProject:
         next_symbol = a
         """
         assert not self.reduce
-        return self.out_queue[0]
+        return self.right[self.dot]
 
     def restSymbols(self) -> list:
         """
@@ -193,22 +342,17 @@ class LRProject:
         rest_symbols = [b, c]
         """
         assert not self.reduce
-        rest_symbols = copy.deepcopy(self.out_queue)
-        rest_symbols.pop(0)
-        return rest_symbols
+        return self.right[self.dot + 1:]
 
-    def nextProject(self):
+    def nextProject(self, grammar: data.Grammar = None):
         """
         this project: A -> B · abc
         next project: A -> Ba · bc
-        :return: LRProject
+        :return: LRProject, with the same id as this one
         """
         assert not self.reduce  # reduce projects do not have next projects
 
-        lr_project = copy.deepcopy(self)
-        symbol = lr_project.out_queue.pop(0)
-        lr_project.queue.append(symbol)
-        lr_project.checkReduce()
+        lr_project = LRProject(self.id, getProductionRuleById(self.production_rule_id, grammar), self.dot + 1)
 
         return lr_project
 
@@ -216,17 +360,16 @@ class LRProject:
         """
         whether this is a reduce project
         """
-        if len(self.out_queue) == 0:
+        if self.dot == len(self.right):
             self.reduce = True
 
     def __hash__(self):
-        # TODO hash conflict ?
-        return hash(self.id) + hash(self.look_forward)
+        return hash(self.id)
 
     def __eq__(self, other):
-        return self.id == other.id and self.look_forward == other.look_forward
+        return self.id == other.id
 
-    def show(self, end: str) -> None:
+    def show(self, end: str, look_forward: str = data.END) -> None:
         print(self.id, end=' ')
         print(self.left, end=' -> ')
         for r in self.queue:
@@ -234,67 +377,119 @@ class LRProject:
         print('·', end=' ')
         for r in self.out_queue:
             print(r, end=' ')
-        print("  look_forward: %s" % self.look_forward, end=' ')
+        print("  look_forward: %s" % look_forward, end=' ')
         print("  link_info:", end=' ')
         print(self.equivalence, end=' ')
         print(self.goto, end=' ')
         print(end, end='')
 
 
-lr_projects = set()
+class LRItem:
+    """
+    read-only view of an item (production rule id, dot, look_forward symbol id)
+    it looks like a LRProject with a str look_forward, so State.show and analyzeTable do not deal with ids
+    """
+    __slots__ = ('project', 'look_forward')
+
+    def __init__(self, item: tuple, lr: StateSet = None):
+        lr = lr or default
+        self.project = lr.project_by_core[(item[0], item[1])]
+        self.look_forward = lr.grammar.symbol_names[item[2]]
+
+    def __getattr__(self, name):
+        return getattr(self.project, name)
+
+    def __hash__(self):
+        return hash((self.project.id, self.look_forward))
+
+    def __eq__(self, other):
+        return self.project.id == other.project.id and self.look_forward == other.look_forward
+
+    def show(self, end: str) -> None:
+        self.project.show(end, self.look_forward)
 
 
-def getProductionRuleById(id) -> data.ProductionRule:
-    for k in data.production_rules:
-        for production_rule in data.production_rules[k]:
-            if production_rule.id == id:
-                return production_rule
+def getProductionRuleById(id, grammar: data.Grammar = None) -> data.ProductionRule:
+    production_rule_list = (grammar or data.default).production_rule_list
+    if 0 <= id < len(production_rule_list):
+        return production_rule_list[id]
     print("production rule with id = %d not found" % id)
     raise Exception
 
 
-def showLRProjects() -> None:
-    for lr_project in lr_projects:
-        production_rule = getProductionRuleById(lr_project.production_rule_id)
+def showLRProjects(lr: StateSet = None) -> None:
+    lr = lr or default
+    for lr_project in lr.lr_projects:
+        production_rule = getProductionRuleById(lr_project.production_rule_id, lr.grammar)
         production_rule.show('    ')
         lr_project.show('\n')
 
 
-def initLRProjects() -> None:
+def initLRProjects(lr: StateSet = None) -> None:
     """
     for every production rule A -> BC
     put A -> · BC, A -> B · C, A -> BC · in lr_projects
     after initialization, set lr_projects will not change
     use function getLRProjectById(id: int) -> LRProject to get a LRProject from it
     """
+    lr = lr or default
+    lr.lr_projects.clear()
+    lr.lr_project_list.clear()
+    lr.project_by_core.clear()
+    lr.projects_by_left.clear()
+    lr.initial_items.clear()
+    production_rules = lr.grammar.production_rules
     id = 0
-    for k in data.production_rules:
-        for production_rule in data.production_rules[k]:
+    for k in production_rules:
+        for production_rule in production_rules[k]:
             project = LRProject(id, production_rule)
+            lr.initial_items.setdefault(project.left, []).append((project.production_rule_id, 0))
             while True:
-                lr_projects.add(project)
+                lr.lr_projects.add(project)
+                lr.lr_project_list.append(project)
+                lr.project_by_core[(project.production_rule_id, project.dot)] = project
+                lr.projects_by_left.setdefault((project.left, project.dot), []).append(project)
                 id += 1
                 if project.reduce:
                     break
-                project = project.nextProject()
+                project = project.nextProject(lr.grammar)
                 project.id = id
 
 
-def generateLRProjects() -> None:
-    initLRProjects()
-    for lr_project in lr_projects:
-        lr_project.generateEquivalence()
-        lr_project.generateGoto()
+@instrument.timed('generateLRProjects')
+def generateLRProjects(lr: StateSet = None) -> None:
+    lr = lr or default
+    initLRProjects(lr)
+    for lr_project in lr.lr_projects:
+        lr_project.generateEquivalence(lr)
+        lr_project.generateGoto(lr)
 
 
 class State:
     def __init__(self, id: int):
         self.id = id
-        self.lr_projects = set()
+        self.items = set()  # set of (production rule id, dot, look_forward symbol id)
         self.goto = dict()  # X -> state.id  goto state.id when the input is X, where X here is nextSymbol()
 
-    def addLRProject(self, lr_project: LRProject) -> None:
-        self.lr_projects.add(lr_project)
+    @property
+    def lr_projects(self) -> set:
+        """
+        items of this state as LRItem views of the default StateSet
+        """
+        return self.lrItems()
+
+    def lrItems(self, lr: StateSet = None) -> set:
+        """
+        items of this state as LRItem views
+        """
+        return {LRItem(item, lr) for item in self.items}
+
+    def addItem(self, item: tuple) -> None:
+        self.items.add(item)
+
+    def addLRProject(self, lr_project: LRItem, grammar: data.Grammar = None) -> None:
+        symbol_ids = (grammar or data.default).symbol_ids
+        self.items.add((lr_project.production_rule_id, lr_project.dot, symbol_ids[lr_project.look_forward]))
 
     def __hash__(self):
         return self.id
@@ -302,9 +497,9 @@ class State:
     def __eq__(self, other):
         return self.id == other.id
 
-    def show(self, end) -> None:
+    def show(self, end, lr: StateSet = None) -> None:
         print('I%d' % self.id)
-        for lr_project in self.lr_projects:
+        for lr_project in self.lrItems(lr):
             lr_project.show('\n')
         print(self.goto, end='')
         print(end)
@@ -315,146 +510,309 @@ def identicalState(state_a: State, state_b: State) -> bool:
     if every lr_project in state_a is in state_b
     then they are regarded as the same
     """
-    for lr_project in state_b.lr_projects:
-        if lr_project not in state_a.lr_projects:
-            return False
-    return True
+    return state_b.items <= state_a.items
 
 
-def getLRProjectById(id: int) -> LRProject:
-    for lr_project in lr_projects:
-        if lr_project.id == id:
-            return lr_project
+def getLRProjectById(id: int, lr: StateSet = None) -> LRProject:
+    lr_project_list = (lr or default).lr_project_list
+    if 0 <= id < len(lr_project_list):
+        return lr_project_list[id]
     print("LR project with id = %d not found" % id)
     raise Exception
 
 
-def getLRProjectByProductionRuleId(id: int) -> LRProject:
-    for lr_project in lr_projects:
-        if lr_project.production_rule_id == id:
-            return lr_project
+def getLRProjectByProductionRuleId(id: int, lr: StateSet = None) -> LRProject:
+    """
+    the project of production rule id with · at the beginning
+    """
+    project_by_core = (lr or default).project_by_core
+    if (id, 0) in project_by_core:
+        return project_by_core[(id, 0)]
     print("LR project with production_rule_id = %d not found" % id)
     raise Exception
 
 
-def closure(state: State) -> State:
-    if len(state.lr_projects) == 0:
+@instrument.timed('closure')
+def closure(state: State, lr: StateSet = None) -> State:
+    """
+    add equivalent projects to state
+    A -> a · Bb, L
+    for every terminal t in first(bL)
+    add B -> · c, t to the state
+    look_forwards are grouped by core (production rule id, dot), and only the look_forwards newly added to a core
+    are propagated again; the closure of every kernel is kept in closure_cache
+    """
+    if len(state.items) == 0:
         return state
-    while True:
-        project_tmp = set()
-        unchanged = True
-        # add equivalent projects
-        # A -> · aB, b
-        # for every terminal t in first(Bb)
-        # add A -> a · B, t to the state
-        for lr_project in state.lr_projects:
-            for id in lr_project.equivalence:
-                equivalent_lr_project = copy.deepcopy(getLRProjectById(id))
-                symbol_seq = copy.deepcopy(lr_project.restSymbols())  # [B]
-                symbol_seq.append(lr_project.look_forward)  # [B, b]
-                first_set = firstOfSymbols(symbol_seq)
-
-                for new_look_forward in first_set:
-                    equivalent_lr_project.look_forward = new_look_forward
-                    project_tmp.add(copy.deepcopy(equivalent_lr_project))
-
-        for project in project_tmp:
-            if project not in state.lr_projects:
-                unchanged = False
-                state.addLRProject(project)
-
-        if unchanged:
-            break
-
+    if instrument.enabled:
+        instrument.add('closure calls')
+    lr = lr or default
+    closure_cache = lr.closure_cache
+    project_by_core = lr.project_by_core
+    initial_items = lr.initial_items
+    key = kernelKey(state.items)
+    if key not in closure_cache:
+        iterations = 0
+        look_forwards = dict()  # core -> bitmask of look_forward
+        for production_rule_id, dot, look_forward in state.items:
+            core = (production_rule_id, dot)
+            look_forwards[core] = look_forwards.get(core, 0) | (1 << look_forward)
+        pending = dict(look_forwards)  # core -> look_forwards not propagated yet
+        worklist = list(pending)
+        while worklist:
+            iterations += 1
+            core = worklist.pop()
+            new_look_forwards = pending.pop(core)
+            lr_project = project_by_core[core]
+            if len(lr_project.equivalence) == 0:
+                continue
+            first_bits = 0
+            for look_forward in bitsToIds(new_look_forwards):
+                first_bits |= firstOfRest(core[0], core[1], look_forward, lr)  # first(bL)
+
+            for equivalent_core in initial_items[lr_project.nextSymbol()]:
+                old = look_forwards.get(equivalent_core, 0)
+                added = first_bits & ~old
+                if not added:
+                    continue
+                look_forwards[equivalent_core] = old | added
+                if equivalent_core in pending:
+                    pending[equivalent_core] |= added
+                else:
+                    pending[equivalent_core] = added
+                    worklist.append(equivalent_core)
+
+        closure_cache[key] = frozenset((core[0], core[1], look_forward)
+                                       for core in look_forwards for look_forward in bitsToIds(look_forwards[core]))
+        if instrument.enabled:
+            instrument.add('closure iterations', iterations)
+            instrument.add('closure items created', len(closure_cache[key]) - len(key))
+    elif instrument.enabled:
+        instrument.add('closure cache hits')
+    state.items = set(closure_cache[key])
+    if instrument.enabled:
+        instrument.add('item set copies')
     return state
 
 
-def goto(state: State, symbol: str) -> set:
-    res = set()
-    for lr_project in state.lr_projects:
-        if lr_project.reduce:  # reduce project do not have goto
+def orderedSymbols(grammar: data.Grammar = None) -> list:
+    """
+    every grammar symbol except EPS in a stable order: terminals first, then nonterminals, as listed in the data files
+    iterating data.symbols directly would make state ids depend on the string hash seed
+    """
+    grammar = grammar or data.default
+    res = []
+    for terminal in grammar.terminals:
+        if terminal == data.EPS:
             continue
-        # A -> a · Bb  next_symbol = B
-        # so if symbol == B, state will goto a new state,and res is in its attribute lr_project
-        assert len(lr_project.goto) == 1
-        for next_symbol in lr_project.goto:
-            if next_symbol == symbol:
-                next_project = copy.deepcopy(getLRProjectById(lr_project.goto[next_symbol]))
-                next_project.look_forward = lr_project.look_forward
-                res.add(next_project)
+        res.append(terminal)
+    for n_terminal in grammar.n_terminals:
+        res.append(n_terminal)
     return res
 
 
-state_set = set()  # set of State
-length = 0  # len(state_set)
+def kernelKey(items: set) -> frozenset:
+    """
+    hashable key of a kernel, made of its (production rule id, dot, look_forward) items
+    the closure of a kernel is unique, so states with the same kernel key are identical
+    """
+    return frozenset(items)
+
+
+@instrument.timed('successors')
+def successors(state: State, lr: StateSet = None) -> dict:
+    """
+    the items of goto(state, X) for every X after a · in state, in one pass over state.items
+    :return: X -> set of items
+    """
+    project_by_core = (lr or default).project_by_core
+    res = dict()
+    for production_rule_id, dot, look_forward in state.items:
+        lr_project = project_by_core[(production_rule_id, dot)]
+        if not lr_project.reduce:
+            res.setdefault(lr_project.nextSymbol(), set()).add((production_rule_id, dot + 1, look_forward))
+    return res
 
 
-def items():
-    global state_set
+@instrument.timed('items')
+def items(lr: StateSet = None):
+    """
+    build the canonical LR(1) collection with a worklist
+    only newly created states are expanded, and an existing state is found through its kernel key
+    state ids are given in breadth-first order
+    """
+    lr = lr or default
+    state_set = lr.state_set = set()
+    state_list = lr.state_list
+    state_list.clear()
+    kernel_index = dict()  # kernel key -> State
+    symbols = orderedSymbols(lr.grammar)
+
     id = 0
     state = State(id)
     id += 1
     # S' -> S, $
-    start_item = getLRProjectByProductionRuleId(0)
-    start_item.look_forward = data.END
-    state.addLRProject(start_item)
-    state = closure(state)
+    state.addItem((0, 0, lr.grammar.symbol_ids[data.END]))
+    kernel_index[kernelKey(state.items)] = state
+    state = closure(state, lr)
     state_set.add(state)
+    state_list.append(state)
+
+    worklist = deque([state])
+    while worklist:
+        state = worklist.popleft()
+        next_items = successors(state, lr)
+        for symbol in symbols:
+            if symbol not in next_items:
+                continue
+            new_items = next_items[symbol]
+            key = kernelKey(new_items)
+            if key in kernel_index:  # state_set already contains new_state
+                if instrument.enabled:
+                    instrument.add('duplicate states found')
+                state.goto[symbol] = kernel_index[key].id
+                continue
+            if instrument.enabled:
+                instrument.add('kernel items created', len(new_items))
+            new_state = State(id)
+            id += 1
+            new_state.items = new_items
+            new_state = closure(new_state, lr)
+            kernel_index[key] = new_state
+            state_set.add(new_state)
+            state_list.append(new_state)
+            state.goto[symbol] = new_state.id
+            worklist.append(new_state)
+
+
+def packItems(lr_items) -> bytes:
+    """
+    (production rule id, dot, look_forward) items as the bytes of an int array, which a pipe carries and a dict
+    hashes much faster than a set of tuples; packItems(sorted(kernel)) is a kernel key too
+    """
+    return array('i', [value for item in lr_items for value in item]).tobytes()
 
-    while True:
-        unchanged = True
-        new_states = set()
-        for state in state_set:
-            for symbol in data.symbols:
-                new_lr_projects = goto(state, symbol)
-                if len(new_lr_projects) != 0:
-                    new_state = State(id)
-                    new_state.lr_projects = copy.deepcopy(new_lr_projects)
-                    new_state = closure(new_state)
-
-                    # whether state_set contains new_state
-                    contain = False
-                    for s in state_set:
-                        if identicalState(new_state, s):
-                            state.goto[symbol] = s.id
-                            contain = True
-                            break
-                    if not contain:
-                        new_states.add(new_state)
-                        state.goto[symbol] = new_state.id
-                        id += 1
-                        unchanged = False
-
-        if unchanged:
-            break
 
-        state_set = state_set | new_states
+def unpackItems(packed: bytes) -> set:
+    values = array('i')
+    values.frombytes(packed)
+    values = iter(values)
+    return set(zip(values, values, values))
 
 
-def getStateById(id: int) -> State:
-    for state in state_set:
-        if state.id == id:
-            return state
+def expandKernels(lr_id: int, kernels: list) -> tuple:
+    """
+    closure and successor kernels of every kernel of a slice of a breadth-first level, run in the worker processes
+    of parallelItems()
+    :param lr_id: key of the StateSet in forked
+    :param kernels: packed kernels
+    :return: (list of (packed closure, list of (index in orderedSymbols(), packed sorted successor kernel)),
+    instrument.report() of the slice or None)
+    """
+    lr = forked[lr_id]
+    if instrument.enabled:
+        instrument.reset()
+    symbols = orderedSymbols(lr.grammar)
+    res = []
+    for kernel in kernels:
+        state = State(-1)
+        state.items = unpackItems(kernel)
+        key = kernelKey(state.items)
+        closure(state, lr)
+        # every kernel is expanded once, keeping its closure in the closure_cache of the worker is of no use
+        lr.closure_cache.pop(key, None)
+        next_items = successors(state, lr)
+        res.append((packItems(state.items), [(i, packItems(sorted(next_items[symbol])))
+                                             for i, symbol in enumerate(symbols) if symbol in next_items]))
+    return res, instrument.report() if instrument.enabled else None
+
+
+@instrument.timed('parallelItems')
+def parallelItems(processes: int, lr: StateSet = None) -> None:
+    """
+    items() with every breadth-first level expanded by a pool of processes: each worker computes the closures and the
+    successor kernels of a slice of the level, this process only finds the new kernels and numbers them in the same
+    order as items() does, so the result is the same
+    the workers are forked and share the grammar, projects and first of this process
+    """
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        items(lr)
+        return
+    lr = lr or default
+    state_set = lr.state_set = set()
+    state_list = lr.state_list
+    state_list.clear()
+    symbols = orderedSymbols(lr.grammar)
+
+    # S' -> S, $
+    kernel = packItems([(0, 0, lr.grammar.symbol_ids[data.END])])
+    kernel_index = {kernel: 0}  # packed kernel -> state id
+    frontier = [kernel]  # packed kernels of the states of a level, in the order of their ids
+    forked[id(lr)] = lr
+    expand = functools.partial(expandKernels, id(lr))
+    # the item sets make no cycles, but each new one counts toward a collection that walks all the others, about a
+    # third of the time of this process; the workers are forked with the collector off too
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        with multiprocessing.get_context('fork').Pool(processes) as pool:
+            while frontier:
+                chunksize = max(1, len(frontier) // (processes * 4))
+                chunks = [frontier[i:i + chunksize] for i in range(0, len(frontier), chunksize)]
+                frontier = []
+                # imap gives the slices in order, the new kernels are numbered while the workers expand the next ones
+                for expanded, report in pool.imap(expand, chunks):
+                    if report is not None:
+                        instrument.merge(report)
+                    for packed_closure, next_kernels in expanded:
+                        state = State(len(state_list))
+                        state.items = unpackItems(packed_closure)
+                        for i, key in next_kernels:
+                            if key not in kernel_index:
+                                kernel_index[key] = len(kernel_index)
+                                frontier.append(key)
+                                if instrument.enabled:
+                                    instrument.add('kernel items created', len(key) // ITEM_BYTES)
+                            elif instrument.enabled:
+                                instrument.add('duplicate states found')
+                            state.goto[symbols[i]] = kernel_index[key]
+                        state_set.add(state)
+                        state_list.append(state)
+    finally:
+        del forked[id(lr)]
+        if collecting:
+            gc.enable()
+
+
+def getStateById(id: int, lr: StateSet = None) -> State:
+    state_list = (lr or default).state_list
+    if 0 <= id < len(state_list):
+        return state_list[id]
     print("state with id = %d not found" % id)
     raise Exception
 
 
-def showStates() -> None:
-    for state in state_set:
-        state.show('\n')
+def showStates(lr: StateSet = None) -> None:
+    lr = lr or default
+    for state in lr.state_set:
+        state.show('\n', lr)
 
 
-def generateLRStateSet():
+def generateLRStateSet(processes: int = 1, lr: StateSet = None):
     # expand your CFG and update n_terminals.txt and production_rules.txt first
     # and make sure that the first rule is the start rule
-    generateFirst()
+    # processes > 1 computes the closures of the states in a pool of processes
+    lr = lr or default
+    generateFirst(lr)
     # showFirst()
-    generateLRProjects()
+    generateLRProjects(lr)
     # showLRProjects()
-    items()
+    if processes > 1:
+        parallelItems(processes, lr)
+    else:
+        items(lr)
     # showStates()
-    global length
-    length = len(state_set)
+    lr.length = len(lr.state_set)
 
 
 if __name__ == '__main__':
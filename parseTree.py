@@ -0,0 +1,303 @@
+import struct
+import sys
+import time
+import tracemalloc
+from array import array
+
+import data
+import lrParser
+
+# what a parse produces besides the list of reductions of lrParser.parse():
+# parseActions() calls a semantic action per reduction and keeps only the values on the LR stack, no tree at all
+# parseArena() keeps the tree in an Arena, parallel int arrays with one entry per reduction
+ARENA_MAGIC = b'LRPT'
+# magic, byte order of the arrays (1 little, 2 big), nodes, children, tokens
+# the header itself is always little endian, so it can be read before the byte order is known
+ARENA_HEADER = struct.Struct('<4sIIII')
+
+
+class Arena:
+    """
+    parse tree in parallel arrays, node i is the i-th reduction, so children come before their parent
+    and the root is the last node
+    a child is a node id >= 0 or a token, -1 - its position in the input
+    """
+    __slots__ = ('production', 'first_child', 'child_count', 'start', 'end', 'children', 'tokens')
+
+    def __init__(self):
+        self.production = array('i')  # node -> production rule id
+        self.first_child = array('i')  # node -> index of its first child in children
+        self.child_count = array('i')  # node -> number of symbols on the right side of its production rule
+        self.start = array('i')  # node -> position of its first token
+        self.end = array('i')  # node -> position after its last token, start == end for an EPS node
+        self.children = array('i')
+        self.tokens = 0  # number of tokens of the input
+
+    def __len__(self) -> int:
+        return len(self.production)
+
+    @property
+    def root(self) -> int:
+        return len(self.production) - 1
+
+    def childrenOf(self, node: int) -> array:
+        return self.children[self.first_child[node]:self.first_child[node] + self.child_count[node]]
+
+    def preorder(self, node: int = None):
+        """
+        node ids of the tree under node (the root by default), parents before children, children left to right
+        """
+        stack = [self.root if node is None else node]
+        children = self.children
+        first_child = self.first_child
+        child_count = self.child_count
+        while stack:
+            node = stack.pop()
+            yield node
+            first = first_child[node]
+            for i in range(first + child_count[node] - 1, first - 1, -1):
+                if children[i] >= 0:
+                    stack.append(children[i])
+
+    def postorder(self):
+        """
+        node ids in the order they were reduced, which is a postorder of the tree
+        """
+        return range(len(self.production))
+
+    def nbytes(self) -> int:
+        return sum(a.itemsize * len(a) for a in self.arrays())
+
+    def arrays(self) -> list:
+        return [self.production, self.first_child, self.child_count, self.start, self.end, self.children]
+
+    def toBytes(self) -> bytes:
+        header = ARENA_HEADER.pack(ARENA_MAGIC, 1 if sys.byteorder == 'little' else 2, len(self.production),
+                                   len(self.children), self.tokens)
+        return b''.join([header] + [a.tobytes() for a in self.arrays()])
+
+    @staticmethod
+    def fromBytes(buffer):
+        magic, byte_order, nodes, children, tokens = ARENA_HEADER.unpack_from(buffer, 0)
+        if magic != ARENA_MAGIC:
+            raise Exception('not a parse tree')
+        res = Arena()
+        res.tokens = tokens
+        offset = ARENA_HEADER.size
+        for a, length in zip(res.arrays(), [nodes] * 5 + [children]):
+            a.frombytes(bytes(buffer[offset:offset + length * a.itemsize]))
+            if byte_order != (1 if sys.byteorder == 'little' else 2):
+                a.byteswap()
+            offset += length * a.itemsize
+        return res
+
+    def show(self, tokens: list = None, node: int = None, indent: int = 0, file=None) -> None:
+        """
+        print the tree, with the terminal names of tokens (names, not ids) as leaves when given
+        the stack of (node or token, indent) keeps deep trees from reaching the recursion limit, like preorder()
+        """
+        file = file or sys.stdout
+        stack = [(self.root if node is None else node, indent)]
+        while stack:
+            node, indent = stack.pop()
+            if node < 0:
+                print('%s%s' % ('  ' * indent, tokens[-1 - node] if tokens else -1 - node), file=file)
+                continue
+            production_rule = data.production_rule_list[self.production[node]]
+            print('%s%s' % ('  ' * indent, production_rule.left), file=file)
+            for child in reversed(self.childrenOf(node)):
+                stack.append((child, indent + 1))
+
+
+def parseArena(tokens: list) -> Arena:
+    """
+    lrParser.parse() building the parse tree in an Arena
+    :param tokens: terminal ids, END is appended automatically
+    """
+    action_ = lrParser.action
+    goto_ = lrParser.goto
+    length_ = lrParser.production_length
+    left_ = lrParser.production_left
+    width = len(lrParser.terminal_ids)
+    goto_width = len(lrParser.n_terminal_ids)
+    end = lrParser.terminal_ids[data.END]
+    limit = len(action_) // width  # reductions in a row after which lrParser.reductionsEnd() checks that they end
+
+    arena = Arena()
+    arena.tokens = len(tokens)
+    production = arena.production
+    first_child = arena.first_child
+    child_count = arena.child_count
+    starts = arena.start
+    ends = arena.end
+    children = arena.children
+    stack = [0]
+    values = []  # the symbol of every state of stack but the first one, a node id or -1 - token position
+    spans = []  # (start, end) of values
+    n = len(tokens)
+    i = 0
+    run = 0  # reductions since the last shift
+    token = tokens[0] if n > 0 else end
+    while True:
+        value = action_[stack[-1] * width + token]
+        kind = value & 3
+        if kind == lrParser.SHIFT:
+            stack.append(value >> 2)
+            values.append(-1 - i)
+            spans.append((i, i + 1))
+            i += 1
+            token = tokens[i] if i < n else end
+            run = 0
+        elif kind == lrParser.REDUCE:
+            production_rule_id = value >> 2
+            length = length_[production_rule_id]
+            first_child.append(len(children))
+            child_count.append(length)
+            production.append(production_rule_id)
+            if length:
+                children.extend(values[-length:])
+                starts.append(spans[-length][0])
+                ends.append(spans[-1][1])
+                del stack[-length:]
+                del values[-length:]
+                del spans[-length:]
+            else:
+                starts.append(i)
+                ends.append(i)
+            values.append(len(production) - 1)
+            spans.append((starts[-1], ends[-1]))
+            stack.append(goto_[stack[-1] * goto_width + left_[production_rule_id]])
+            run += 1
+            if run == limit and not lrParser.reductionsEnd(stack, token, lrParser.actionOf, lrParser.gotoOf):
+                raise SyntaxError('endless reductions on token %d at position %d in state %d' % (token, i, stack[-1]))
+        elif kind == lrParser.ACCEPT:
+            return arena
+        else:
+            raise SyntaxError('unexpected token %d at position %d in state %d' % (token, i, stack[-1]))
+
+
+def parseActions(tokens: list, actions, shift=None):
+    """
+    lrParser.parse() calling a semantic action for every reduction, only the values on the LR stack are kept
+    :param tokens: terminal ids, END is appended automatically
+    :param actions: production rule id -> function of the values of the right side, returning the value of the left
+    side; a missing or None action gives None
+    :param shift: function of (token, position) returning the value of a token, the token id by default
+    :return: value of the start symbol
+    """
+    action_ = lrParser.action
+    goto_ = lrParser.goto
+    length_ = lrParser.production_length
+    left_ = lrParser.production_left
+    width = len(lrParser.terminal_ids)
+    goto_width = len(lrParser.n_terminal_ids)
+    end = lrParser.terminal_ids[data.END]
+    limit = len(action_) // width  # reductions in a row after which lrParser.reductionsEnd() checks that they end
+    if isinstance(actions, dict):
+        actions = [actions.get(id) for id in range(len(data.production_rule_list))]
+
+    stack = [0]
+    values = []
+    n = len(tokens)
+    i = 0
+    run = 0  # reductions since the last shift
+    token = tokens[0] if n > 0 else end
+    while True:
+        value = action_[stack[-1] * width + token]
+        kind = value & 3
+        if kind == lrParser.SHIFT:
+            stack.append(value >> 2)
+            values.append(token if shift is None else shift(token, i))
+            i += 1
+            token = tokens[i] if i < n else end
+            run = 0
+        elif kind == lrParser.REDUCE:
+            production_rule_id = value >> 2
+            length = length_[production_rule_id]
+            semantic_action = actions[production_rule_id]
+            if length:
+                result = semantic_action(*values[-length:]) if semantic_action is not None else None
+                del stack[-length:]
+                del values[-length:]
+            else:
+                result = semantic_action() if semantic_action is not None else None
+            values.append(result)
+            stack.append(goto_[stack[-1] * goto_width + left_[production_rule_id]])
+            run += 1
+            if run == limit and not lrParser.reductionsEnd(stack, token, lrParser.actionOf, lrParser.gotoOf):
+                raise SyntaxError('endless reductions on token %d at position %d in state %d' % (token, i, stack[-1]))
+        elif kind == lrParser.ACCEPT:
+            return values[-1] if values else None
+        else:
+            raise SyntaxError('unexpected token %d at position %d in state %d' % (token, i, stack[-1]))
+
+
+class Node:
+    """
+    a python object per tree node, what parseArena() avoids, only used to compare with it
+    """
+    __slots__ = ('production_rule_id', 'children')
+
+    def __init__(self, production_rule_id: int, children: tuple):
+        self.production_rule_id = production_rule_id
+        self.children = children
+
+
+def parseObjects(tokens: list) -> Node:
+    return parseActions(tokens, [lambda *children, id=id: Node(id, children)
+                                 for id in range(len(data.production_rule_list))])
+
+
+def measure(parser, tokens: list) -> tuple:
+    """
+    :return: (seconds, bytes still allocated by the result, peak bytes) of parser(tokens)
+    """
+    start = time.perf_counter()
+    parser(tokens)
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    result = parser(tokens)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return seconds, current, peak
+
+
+if __name__ == '__main__':
+    import analyzeTable
+    import lrStateSet
+
+    data.readData()
+    lrStateSet.generateLRStateSet()
+    analyzeTable.generateAnalyzeTable()
+    lrParser.encodeTables()
+    tokens = lrParser.tokenIds(lrParser.sampleProgram(5000))
+
+    arena = parseArena(tokens)
+    assert list(arena.production) == lrParser.parse(tokens)
+    assert arena.start[arena.root] == 0 and arena.end[arena.root] == len(tokens)
+    copy = Arena.fromBytes(arena.toBytes())
+    assert all(a == b for a, b in zip(copy.arrays(), arena.arrays()))
+    assert sorted(arena.preorder()) == list(arena.postorder())
+
+    # count the nodes of every nonterminal with callbacks only
+    counts = dict()
+
+    def count(*values, left=None):
+        counts[left] = counts.get(left, 0) + 1
+
+    actions = [lambda *values, left=production_rule.left: count(left=left) for production_rule in data.production_rule_list]
+    parseActions(tokens, actions)
+    assert sum(counts.values()) == len(arena)
+
+    print('tokens: %d  nodes: %d  arena: %d bytes, %d serialized' % (
+        len(tokens), len(arena), arena.nbytes(), len(arena.toBytes())))
+    print('%-12s %10s %16s %16s' % ('mode', 'ms', 'bytes/token kept', 'bytes/token peak'))
+    modes = [('reductions', lrParser.parse), ('callbacks', lambda t: parseActions(t, actions)),
+             ('arena', parseArena), ('objects', parseObjects)]
+    for name, parser in modes:
+        seconds, current, peak = measure(parser, tokens)
+        print('%-12s %10.1f %16.1f %16.1f' % (name, seconds * 1000, current / len(tokens), peak / len(tokens)))
+    start = time.perf_counter()
+    nodes = sum(1 for _ in arena.preorder())
+    print('preorder walk of %d nodes: %.1f ms' % (nodes, (time.perf_counter() - start) * 1000))
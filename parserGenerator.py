@@ -0,0 +1,185 @@
+import os
+import py_compile
+import shutil
+import subprocess
+import sys
+
+import data
+import lrParser
+
+# writes a parser module that needs none of the generator modules: the encoded tables of lrParser as constant
+# tuples, which python loads from the .pyc without running anything, and a parse loop with the table widths inlined
+
+TEMPLATE = '''# generated by parserGenerator.py, do not edit
+# %(description)s
+# an action keeps its kind in the low 2 bits: 0 error, 1 shift, 2 reduce, 3 accept; the state or production rule id
+# in the others
+
+TERMINALS = %(terminals)s  # column -> terminal, the last one is the end of the input
+N_TERMINALS = %(n_terminals)s  # column -> nonterminal
+PRODUCTION_RULES = %(production_rules)s
+TERMINAL_IDS = {terminal: i for i, terminal in enumerate(TERMINALS)}
+END = %(end)d
+
+ACTION = %(action)s  # state * %(width)d + terminal -> action
+GOTO = %(goto)s  # state * %(goto_width)d + nonterminal -> state
+PRODUCTION_LENGTH = %(production_length)s
+PRODUCTION_LEFT = %(production_left)s  # production rule id -> column of its left side in GOTO
+
+
+def tokenIds(tokens):
+    """
+    terminal names -> terminal ids used by parse()
+    """
+    return [TERMINAL_IDS[token] for token in tokens]
+
+
+def parse(tokens):
+    """
+    :param tokens: terminal ids, the end of the input is appended automatically
+    :return: production rule ids in the order they are reduced
+    """
+    action = ACTION
+    goto = GOTO
+    length_ = PRODUCTION_LENGTH
+    left_ = PRODUCTION_LEFT
+    reductions = []
+    stack = [0]
+    n = len(tokens)
+    i = 0
+    token = tokens[0] if n > 0 else %(end)d
+    while True:
+        value = action[stack[-1] * %(width)d + token]
+        kind = value & 3
+        if kind == 1:
+            stack.append(value >> 2)
+            i += 1
+            token = tokens[i] if i < n else %(end)d
+        elif kind == 2:
+            production_rule_id = value >> 2
+            length = length_[production_rule_id]
+            if length:
+                del stack[-length:]
+            stack.append(goto[stack[-1] * %(goto_width)d + left_[production_rule_id]])
+            reductions.append(production_rule_id)
+        elif kind == 3:
+            return reductions
+        else:
+            raise SyntaxError('unexpected %%s at position %%d in state %%d' %% (
+                TERMINALS[token], i, stack[-1]))
+'''
+
+
+def tupleSource(values, per_line: int = 20) -> str:
+    """
+    a tuple literal with per_line values on a line
+    """
+    values = list(values)
+    if len(values) == 0:
+        return '()'
+    lines = []
+    for i in range(0, len(values), per_line):
+        lines.append('    ' + ', '.join(repr(value) for value in values[i:i + per_line]) + ',')
+    return '(\n' + '\n'.join(lines) + '\n)'
+
+
+def generateSource(description: str = '') -> str:
+    """
+    source of the parser module of the tables in lrParser, call lrParser.encodeTables() first
+    """
+    production_rules = []
+    for production_rule in data.production_rule_list:
+        right = ' '.join(production_rule.right) if production_rule.right != [data.EPS] else 'EPS'
+        production_rules.append('%s -> %s' % (production_rule.left, right))
+    return TEMPLATE % {
+        'description': description,
+        'terminals': tupleSource(lrParser.terminal_ids, 10),
+        'n_terminals': tupleSource(lrParser.n_terminal_ids, 10),
+        'production_rules': tupleSource(production_rules, 1),
+        'end': lrParser.terminal_ids[data.END],
+        'width': len(lrParser.terminal_ids),
+        'goto_width': len(lrParser.n_terminal_ids),
+        'action': tupleSource(lrParser.action, len(lrParser.terminal_ids)),
+        'goto': tupleSource(lrParser.goto, len(lrParser.n_terminal_ids)),
+        'production_length': tupleSource(lrParser.production_length),
+        'production_left': tupleSource(lrParser.production_left),
+    }
+
+
+def writeParser(path: str, description: str = '') -> None:
+    """
+    write the module and its .pyc, also when PYTHONDONTWRITEBYTECODE keeps import from writing it
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(generateSource(description))
+    py_compile.compile(path, doraise=True)
+
+
+# startup of a fresh interpreter, the time of the interpreter itself is not counted
+IMPORT_GENERATED = '''
+import time
+start = time.perf_counter()
+import %(module)s as parser
+reductions = parser.parse(parser.tokenIds(%(tokens)r))
+print(time.perf_counter() - start, len(reductions))
+'''
+REBUILD = '''
+import time
+start = time.perf_counter()
+import analyzeTable, data, lalrStateSet, lrParser, lrStateSet
+data.readData()
+if %(lalr)r:
+    lalrStateSet.generateLALRStateSet()
+else:
+    lrStateSet.generateLRStateSet()
+analyzeTable.generateAnalyzeTable()
+lrParser.encodeTables()
+reductions = lrParser.parse(lrParser.tokenIds(%(tokens)r))
+print(time.perf_counter() - start, len(reductions))
+'''
+
+
+def startup(code: str, path: str) -> tuple:
+    """
+    :return: (seconds, reductions) printed by code run in a new interpreter with path first on sys.path
+    """
+    environment = dict(os.environ, PYTHONPATH=os.pathsep.join([path, os.path.abspath('.')]))
+    output = subprocess.run([sys.executable, '-c', code], env=environment, cwd=os.path.abspath('.'),
+                            check=True, capture_output=True, text=True).stdout.split()
+    return float(output[0]), int(output[1])
+
+
+if __name__ == '__main__':
+    # python ./parserGenerator.py [lalr] [out.py]
+    import tempfile
+
+    import analyzeTable
+    import lalrStateSet
+    import lrStateSet
+
+    lalr = 'lalr' in sys.argv[1:]
+    outputs = [argument for argument in sys.argv[1:] if argument.endswith('.py')]
+    data.readData()
+    if lalr:
+        lalrStateSet.generateLALRStateSet()
+    else:
+        lrStateSet.generateLRStateSet()
+    analyzeTable.generateAnalyzeTable()
+    lrParser.encodeTables()
+    description = '%s tables of ./data, %d states' % ('LALR(1)' if lalr else 'LR(1)', lrStateSet.length)
+    if outputs:
+        writeParser(outputs[0], description)
+
+    tokens = lrParser.sampleProgram(100)
+    with tempfile.TemporaryDirectory() as directory:
+        writeParser(os.path.join(directory, 'generatedParser.py'), description)
+        arguments = {'module': 'generatedParser', 'tokens': tokens, 'lalr': lalr}
+        cached, cached_reductions = startup(IMPORT_GENERATED % arguments, directory)
+        shutil.rmtree(os.path.join(directory, '__pycache__'))
+        first, reductions = startup(IMPORT_GENERATED % arguments, directory)
+        rebuilt, expected = startup(REBUILD % arguments, directory)
+        assert reductions == cached_reductions == expected
+        print('import generated module, compiled from source:  %8.2f ms' % (first * 1000))
+        print('import generated module, from .pyc:             %8.2f ms' % (cached * 1000))
+        print('rebuild with generateLRStateSet:                %8.2f ms' % (rebuilt * 1000))
+        print('speedup: %.1f' % (rebuilt / cached))
@@ -0,0 +1,141 @@
+import sys
+
+import analyzeTable
+import data
+import grammarAnalysis
+import lalrStateSet
+import lrParser
+import lrStateSet
+import tableCache
+
+# a Grammar and the TableBuilders made from it keep their own data.Grammar, lrStateSet.StateSet,
+# analyzeTable.AnalyzeTable and lrParser.EncodedTables and pass them to the module functions, so any number of
+# grammars can be built and parsed with in one process, also in threads at the same time, and each is released
+# with its instance; the module-level names of those modules are their default instances and are not touched
+BUNDLED = tuple(tableCache.GRAMMAR_FILES)
+
+
+class Grammar(data.Grammar):
+    """
+    the symbols, production rules and precedence read from files in the format of ./data
+    """
+    def __init__(self, files: tuple = BUNDLED, prune: bool = False):
+        """
+        :param files: (terminal file, nonterminal file, production rule file[, precedence file])
+        :param prune: validate the grammar and remove its useless production rules with grammarAnalysis
+        """
+        super().__init__()
+        self.files = tuple(files)
+        self.analysis = grammarAnalysis.Analysis(self)
+        data.readSymbols(files[0], files[1], self)
+        data.readProductionRules(files[2], self)
+        if len(files) > 3:
+            data.readPrecedence(files[3], self)
+        if prune:
+            grammarAnalysis.prepareGrammar(self.analysis)
+
+    @property
+    def problems(self) -> list:
+        return self.analysis.problems
+
+
+class TableBuilder:
+    """
+    the states and tables of one grammar
+    """
+    def __init__(self, grammar: Grammar, mode: str = 'lr1', processes: int = 1):
+        """
+        :param mode: 'lr1' or 'lalr'
+        :param processes: > 1 computes the LR(1) closures in a pool of processes
+        """
+        self.grammar = grammar
+        self.mode = mode
+        self.processes = processes
+        self.release()
+
+    def build(self):
+        """
+        states, analyzeTable tables and the encoded tables of lrParser
+        :return: self
+        """
+        if self.mode == 'lalr':
+            lalrStateSet.generateLALRStateSet(self.state_set)
+        else:
+            lrStateSet.generateLRStateSet(self.processes, self.state_set)
+        analyzeTable.generateAnalyzeTable(self.table)
+        lrParser.encodeTables(self.encoded)
+        return self
+
+    def release(self) -> None:
+        """
+        forget the states and tables, build() makes them again
+        """
+        self.state_set = lrStateSet.StateSet(self.grammar)
+        self.table = analyzeTable.AnalyzeTable(self.state_set)
+        self.encoded = lrParser.EncodedTables(self.table)
+
+    @property
+    def states(self) -> int:
+        return self.state_set.length
+
+    @property
+    def action_table(self) -> list:
+        return self.table.action_table
+
+    @property
+    def goto_table(self) -> list:
+        return self.table.goto_table
+
+    @property
+    def conflicts(self) -> list:
+        return self.table.conflicts
+
+    def parse(self, tokens: list) -> list:
+        """
+        :param tokens: terminal names
+        :return: production rule ids in the order they are reduced
+        """
+        return lrParser.parse(lrParser.tokenIds(tokens, self.encoded), self.encoded)
+
+    def showAnalyzeTable(self, file=None) -> None:
+        analyzeTable.showAnalyzeTable(file, self.table)
+
+    def showConflicts(self, file=sys.stderr) -> None:
+        analyzeTable.showConflicts(file, self.table)
+
+    def writeTable(self, path: str, format: str = None) -> None:
+        import tableFile
+        tableFile.writeTable(path, format, self.encoded)
+
+
+if __name__ == '__main__':
+    # build the bundled and the generated grammars in threads, then check each against a build of its own
+    import os
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+
+    import grammarGenerator
+
+    with tempfile.TemporaryDirectory() as directory:
+        grammars = [('bundled', BUNDLED),
+                    ('expression', grammarGenerator.writeGrammar(os.path.join(directory, 'expression'),
+                                                                 grammarGenerator.expressionGrammar())),
+                    ('statement', grammarGenerator.writeGrammar(os.path.join(directory, 'statement'),
+                                                                grammarGenerator.statementGrammar())),
+                    ('ambiguous', grammarGenerator.writeGrammar(os.path.join(directory, 'ambiguous'),
+                                                                grammarGenerator.ambiguousGrammar(),
+                                                                grammarGenerator.arithmeticPrecedence()))]
+        builders = []
+        for name, files in grammars:
+            grammar = Grammar(files)
+            for mode in ['lr1', 'lalr']:
+                builders.append((name, TableBuilder(grammar, mode)))
+        with ThreadPoolExecutor(4) as pool:
+            list(pool.map(TableBuilder.build, [builder for name, builder in builders]))
+        for name, builder in builders:
+            alone = TableBuilder(Grammar(builder.grammar.files), builder.mode).build()
+            assert (builder.action_table, builder.goto_table) == (alone.action_table, alone.goto_table)
+            alone.release()
+            print('%-12s %-5s %5d states %3d conflicts' % (name, builder.mode, builder.states, len(builder.conflicts)))
+        assert len(data.production_rule_list) == 0 and len(analyzeTable.action_table) == 0
+        print('bundled program reductions: %d' % len(builders[0][1].parse(lrParser.sampleProgram(100))))
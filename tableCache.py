@@ -0,0 +1,170 @@
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import time
+
+import analyzeTable
+import data
+import lalrStateSet
+import lrParser
+import lrStateSet
+
+VERSION = 2  # change it whenever the layout below or the generated tables change
+MAGIC = b'LRTB'
+CACHE_DIR = './cache'
+GRAMMAR_FILES = ['./data/terminals.txt', './data/n_terminals.txt', './data/production_rules.txt',
+                 './data/precedence.txt']
+
+# layout, all ints in native byte order:
+# header: magic, version, byte order (1 little, 2 big), number of terminal columns, number of nonterminal columns,
+#         number of states, number of production rules, length of the names
+# names: terminal columns then nonterminal columns, utf-8, separated by '\n', padded to 4 bytes
+# arrays of int32: action, goto, production_length, production_left
+HEADER = struct.Struct('=4sIIIIIII')
+
+mapped = None  # mmap of the loaded table file, lrParser arrays are views of it
+
+
+def grammarHash(files: list = GRAMMAR_FILES, mode: str = 'lr1') -> str:
+    """
+    hash of the grammar files, the table mode and VERSION, used as the name of the table file
+    """
+    h = hashlib.sha256()
+    h.update(('%s %d\n' % (mode, VERSION)).encode())
+    for file in files:
+        if not os.path.exists(file):
+            # precedence.txt is optional
+            h.update(b'-\n')
+            continue
+        with open(file, 'rb') as f:
+            content = f.read()
+        h.update(b'%d\n' % len(content))
+        h.update(content)
+    return h.hexdigest()
+
+
+def cachePath(mode: str = 'lr1') -> str:
+    return os.path.join(CACHE_DIR, grammarHash(GRAMMAR_FILES, mode) + '.lrt')
+
+
+def tablesToBytes(encoded: lrParser.EncodedTables = None) -> bytes:
+    """
+    the tables of lrParser in the layout above
+    """
+    encoded = encoded or lrParser.default
+    names = '\n'.join(list(encoded.terminal_ids) + list(encoded.n_terminal_ids)).encode('utf-8')
+    names += b'\0' * (-len(names) % 4)
+    header = HEADER.pack(MAGIC, VERSION, 1 if sys.byteorder == 'little' else 2,
+                         len(encoded.terminal_ids), len(encoded.n_terminal_ids),
+                         len(encoded.action) // len(encoded.terminal_ids), len(encoded.production_length),
+                         len(names))
+    res = [header, names]
+    for a in [encoded.action, encoded.goto, encoded.production_length, encoded.production_left]:
+        res.append(bytes(a))
+    return b''.join(res)
+
+
+def loadBuffer(buffer, encoded: lrParser.EncodedTables = None) -> bool:
+    """
+    point the tables of lrParser at buffer (bytes, mmap, shared memory ...) in the layout above, nothing is copied
+    buffer may be longer than the tables, like a block of shared memory, encoded is not changed when False is returned
+    :return: False if buffer was written by another version or byte order, or is too short
+    """
+    encoded = encoded or lrParser.default
+    if len(buffer) < HEADER.size:
+        return False
+    magic, version, byte_order, terminals, n_terminals, states, production_rules, names_length = \
+        HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or version != VERSION or byte_order != (1 if sys.byteorder == 'little' else 2):
+        return False
+    lengths = [states * terminals, states * n_terminals, production_rules, production_rules]
+    if len(buffer) < HEADER.size + names_length + 4 * sum(lengths):
+        return False
+
+    offset = HEADER.size
+    try:
+        names = bytes(buffer[offset:offset + names_length]).rstrip(b'\0').decode('utf-8').split('\n')
+    except UnicodeDecodeError:
+        return False
+    if len(names) != terminals + n_terminals:
+        return False
+    offset += names_length
+    view = memoryview(buffer)
+    arrays = []
+    for length in lengths:
+        arrays.append(view[offset:offset + length * 4].cast('i'))
+        offset += length * 4
+
+    encoded.terminal_ids.clear()
+    encoded.n_terminal_ids.clear()
+    for i, name in enumerate(names[:terminals]):
+        encoded.terminal_ids[name] = i
+    for i, name in enumerate(names[terminals:]):
+        encoded.n_terminal_ids[name] = i
+    encoded.action, encoded.goto, encoded.production_length, encoded.production_left = arrays
+    return True
+
+
+def saveTables(path: str) -> None:
+    """
+    write the tables of lrParser to path, the file is replaced atomically so running readers are not affected
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp, 'wb') as f:
+        f.write(tablesToBytes())
+    os.replace(tmp, path)
+
+
+def loadTables(path: str) -> bool:
+    """
+    map path read-only and point the tables of lrParser at it, nothing is copied,
+    so processes loading the same file share its pages
+    :return: False if the file is missing, too short or was written by another version or byte order
+    """
+    global mapped
+    if not os.path.exists(path) or os.path.getsize(path) < HEADER.size:
+        return False
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if not loadBuffer(buffer):
+        buffer.close()
+        return False
+    previous, mapped = mapped, buffer
+    if previous is not None:
+        try:
+            previous.close()
+        except BufferError:
+            pass  # arrays of it are still in use somewhere, it is closed when they are collected
+    return True
+
+
+def loadOrBuild(mode: str = 'lr1') -> bool:
+    """
+    load the tables of the current grammar files from CACHE_DIR, or build and save them
+    :return: whether the tables came from the cache
+    """
+    path = cachePath(mode)
+    if loadTables(path):
+        return True
+    data.readData()
+    if mode == 'lalr':
+        lalrStateSet.generateLALRStateSet()
+    else:
+        lrStateSet.generateLRStateSet()
+    analyzeTable.generateAnalyzeTable()
+    lrParser.encodeTables()
+    saveTables(path)
+    return False
+
+
+if __name__ == '__main__':
+    mode = 'lalr' if 'lalr' in sys.argv[1:] else 'lr1'
+    start = time.perf_counter()
+    hit = loadOrBuild(mode)
+    seconds = time.perf_counter() - start
+    print('%s %s in %.4fs' % (cachePath(mode), 'loaded' if hit else 'built', seconds))
+    reductions = lrParser.parse(lrParser.tokenIds(lrParser.sampleProgram(1000)))
+    print('reductions: %d' % len(reductions))
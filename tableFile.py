@@ -0,0 +1,197 @@
+import csv
+import io
+import json
+import os
+import sys
+import time
+
+import analyzeTable
+import data
+import lrParser
+import lrStateSet
+import tableCache
+
+# analyzeTable.action_table and analyzeTable.goto_table written to and read back from files, always in UTF-8:
+# text: the output of analyzeTable.showAnalyzeTable(), cells separated by spaces
+# csv: the same rows as csv
+# json: {"terminals": [...], "n_terminals": [...], "action": [[cell, ...], ...], "goto": [[state, ...], ...]}
+# binary: the layout of tableCache, actions encoded like lrParser
+FORMATS = {'.txt': 'text', '.csv': 'csv', '.json': 'json', '.lrt': 'binary', '.bin': 'binary'}
+
+
+def formatOf(path: str, format: str = None) -> str:
+    if format is not None:
+        return format
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS:
+        raise Exception('unknown table format of %s, use one of %s' % (path, ' '.join(FORMATS)))
+    return FORMATS[extension]
+
+
+def writeText(f, encoded: lrParser.EncodedTables = None) -> None:
+    analyzeTable.showAnalyzeTable(f, (encoded or lrParser.default).table)
+
+
+def writeCsv(f, encoded: lrParser.EncodedTables = None) -> None:
+    csv.writer(f, lineterminator='\n').writerows(analyzeTable.tableRows((encoded or lrParser.default).table))
+
+
+def writeJson(f, encoded: lrParser.EncodedTables = None) -> None:
+    table = (encoded or lrParser.default).table
+    terminals, n_terminals = analyzeTable.tableColumns(table.state_set.grammar)
+    terminals = list(dict.fromkeys(terminals))
+    json.dump({
+        'terminals': terminals,
+        'n_terminals': n_terminals,
+        'action': [[row[terminal] for terminal in terminals] for row in table.action_table],
+        'goto': [[row[n_terminal] for n_terminal in n_terminals] for row in table.goto_table],
+    }, f, separators=(',', ':'))
+
+
+def writeBinary(f, encoded: lrParser.EncodedTables = None) -> None:
+    lrParser.encodeTables(encoded)
+    f.write(tableCache.tablesToBytes(encoded))
+
+
+def writeTable(path: str, format: str = None, encoded: lrParser.EncodedTables = None) -> None:
+    """
+    write the current tables to path, or to sys.stdout when path is '-'
+    :param format: 'text', 'csv', 'json' or 'binary', by default chosen by the extension of path
+    :param encoded: the tables, encoded.table is written in the text formats
+    """
+    format = formatOf(path, format or ('text' if path == '-' else None))
+    if path == '-':
+        if format == 'binary':
+            writeBinary(sys.stdout.buffer, encoded)
+        else:
+            writer = {'text': writeText, 'csv': writeCsv, 'json': writeJson}[format]
+            f = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', newline='', write_through=True)
+            writer(f, encoded)
+            # a collected wrapper closes the buffer it wraps, which is sys.stdout's
+            f.flush()
+            f.detach()
+        return
+    if format == 'binary':
+        with open(path, 'wb') as f:
+            writeBinary(f, encoded)
+        return
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        {'text': writeText, 'csv': writeCsv, 'json': writeJson}[format](f, encoded)
+
+
+def cell(value: str):
+    return 0 if value == '0' else value
+
+
+def setTables(terminals: list, n_terminals: list, actions: list, gotos: list,
+              table: analyzeTable.AnalyzeTable = None) -> None:
+    """
+    fill analyzeTable.action_table and analyzeTable.goto_table from rows of cells in the order of the columns
+    """
+    table = table or analyzeTable.default
+    table.action_table.clear()
+    table.goto_table.clear()
+    for row in actions:
+        table.action_table.append(dict(zip(terminals, row)))
+    for row in gotos:
+        table.goto_table.append(dict(zip(n_terminals, row)))
+    table.state_set.length = len(table.action_table)
+
+
+def readRows(rows: list, table: analyzeTable.AnalyzeTable = None) -> None:
+    """
+    the rows of the text or csv format, the columns up to END are terminals
+    """
+    header = rows[0][1:]
+    split = header.index(data.END) + 1
+    terminals, n_terminals = header[:split], header[split:]
+    actions = []
+    gotos = []
+    for row in rows[1:]:
+        if len(row) == 0:
+            continue
+        actions.append([cell(value) for value in row[1:split + 1]])
+        gotos.append([int(value) for value in row[split + 1:]])
+    setTables(terminals, n_terminals, actions, gotos, table)
+
+
+def readText(f, encoded: lrParser.EncodedTables = None) -> None:
+    readRows([line.split() for line in f.read().split('\n')], (encoded or lrParser.default).table)
+
+
+def readCsv(f, encoded: lrParser.EncodedTables = None) -> None:
+    readRows(list(csv.reader(f)), (encoded or lrParser.default).table)
+
+
+def readJson(f, encoded: lrParser.EncodedTables = None) -> None:
+    table = json.load(f)
+    setTables(table['terminals'], table['n_terminals'], table['action'], table['goto'],
+              (encoded or lrParser.default).table)
+
+
+def decodeAction(value: int):
+    """
+    the inverse of lrParser.encodeAction
+    """
+    kind = value & 3
+    if kind == lrParser.ERROR:
+        return analyzeTable.EXPLICIT_ERROR if value == lrParser.EXPLICIT_ERROR else 0
+    if kind == lrParser.ACCEPT:
+        return 'acc'
+    return ('s' if kind == lrParser.SHIFT else 'r') + str(value >> 2)
+
+
+def readBinary(f, encoded: lrParser.EncodedTables = None) -> None:
+    """
+    also leaves the encoded tables in encoded, ready for lrParser.parse()
+    """
+    encoded = encoded or lrParser.default
+    if not tableCache.loadBuffer(f.read(), encoded):
+        raise Exception('table file of another version or byte order')
+    terminals = list(encoded.terminal_ids)
+    n_terminals = list(encoded.n_terminal_ids)
+    width = len(terminals)
+    goto_width = len(n_terminals)
+    action = encoded.action
+    goto = encoded.goto
+    states = len(action) // width
+    actions = [[decodeAction(value) for value in action[i * width:(i + 1) * width]] for i in range(states)]
+    gotos = [list(goto[i * goto_width:(i + 1) * goto_width]) for i in range(states)]
+    setTables(terminals, n_terminals, actions, gotos, encoded.table)
+
+
+def readTable(path: str, format: str = None, encoded: lrParser.EncodedTables = None) -> None:
+    """
+    load analyzeTable.action_table and analyzeTable.goto_table, or those of encoded.table, from a file written by
+    writeTable(), the grammar files are not needed
+    """
+    format = formatOf(path, format)
+    if format == 'binary':
+        with open(path, 'rb') as f:
+            readBinary(f, encoded)
+        return
+    with open(path, encoding='utf-8', newline='') as f:
+        {'text': readText, 'csv': readCsv, 'json': readJson}[format](f, encoded)
+
+
+if __name__ == '__main__':
+    # write and read back the table in every format
+    import tempfile
+
+    data.readData()
+    lrStateSet.generateLRStateSet()
+    analyzeTable.generateAnalyzeTable()
+    expected = (list(analyzeTable.action_table), list(analyzeTable.goto_table))
+    with tempfile.TemporaryDirectory() as directory:
+        for extension in ['.txt', '.csv', '.json', '.lrt']:
+            path = os.path.join(directory, 'analyze_table' + extension)
+            start = time.perf_counter()
+            writeTable(path)
+            write = time.perf_counter() - start
+            start = time.perf_counter()
+            readTable(path)
+            read = time.perf_counter() - start
+            assert (analyzeTable.action_table, analyzeTable.goto_table) == expected
+            print('%-8s write %8.2f ms  read %8.2f ms  %8d bytes' % (
+                FORMATS[extension], write * 1000, read * 1000, os.path.getsize(path)))
+            analyzeTable.action_table[:], analyzeTable.goto_table[:] = expected
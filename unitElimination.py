@@ -0,0 +1,227 @@
+import sys
+
+import analyzeTable
+import data
+import lalrStateSet
+import lrParser
+import lrStateSet
+
+# optional pass over analyzeTable.action_table and analyzeTable.goto_table after generateAnalyzeTable():
+# a state whose only action is the reduction of a unit production rule A -> B is never entered,
+# the goto on B that led to it goes straight to the goto on A of the same state
+
+
+class Elimination:
+    """
+    the unit reductions removed from the tables of an lrParser.EncodedTables, the functions below work on the default
+    instance unless given one, the module-level names, unitElimination.chains and so on, are its attributes
+    """
+    def __init__(self, encoded: lrParser.EncodedTables = None):
+        self.encoded = encoded or lrParser.default
+        # (state id, nonterminal) -> ids of the unit production rules bypassed by that goto, in reduce order
+        self.chains = dict()
+        self.statistics = dict()  # what the last eliminateUnitReductions() removed
+
+
+default = Elimination()
+
+
+def __getattr__(name):
+    return getattr(default, name)
+
+
+def unitRule(production_rule: data.ProductionRule, grammar: data.Grammar = None) -> bool:
+    """
+    A -> B with B a nonterminal, the start rule is kept since reducing it accepts
+    """
+    n_terminal_set = (grammar or data.default).n_terminal_set
+    return production_rule.id != 0 and len(production_rule.right) == 1 and production_rule.right[0] in n_terminal_set
+
+
+def unitReduction(state_id: int, table: analyzeTable.AnalyzeTable = None):
+    """
+    :return: the id of the unit production rule that is the only action of the state, None if there is no such rule
+    """
+    table = table or analyzeTable.default
+    grammar = table.state_set.grammar
+    res = None
+    for value in table.action_table[state_id].values():
+        if value == 0:
+            continue
+        if value[0] != 'r' or (res is not None and value != res):
+            return None
+        res = value
+    for value in table.goto_table[state_id].values():
+        if value != 0:
+            return None
+    if res is None or not unitRule(grammar.production_rule_list[int(res[1:])], grammar):
+        return None
+    return int(res[1:])
+
+
+def bypass(state_id: int, n_terminal: str, units: dict, goto_table: list, grammar: data.Grammar = None) -> tuple:
+    """
+    follow the gotos of state_id from n_terminal through states that only reduce a unit production rule
+    :param goto_table: the goto table before any goto was rewritten, a rewritten goto already skips a part of the chain
+    :return: (the state reached, ids of the unit production rules reduced on the way)
+    """
+    production_rule_list = (grammar or data.default).production_rule_list
+    chain = []
+    seen = {n_terminal}
+    target = goto_table[state_id][n_terminal]
+    while target in units:
+        left = production_rule_list[units[target]].left
+        if left in seen:  # A -> B, B -> A, the grammar is ambiguous, stop before looping
+            break
+        seen.add(left)
+        chain.append(units[target])
+        target = goto_table[state_id][left]
+    return target, chain
+
+
+def renumber(keep: list, elimination: Elimination = None) -> None:
+    """
+    keep only the states in keep, state keep[i] becomes state i, chains are renumbered the same way
+    """
+    elimination = elimination or default
+    table = elimination.encoded.table
+    chains = elimination.chains
+    ids = {old: new for new, old in enumerate(keep)}
+    action_table = []
+    goto_table = []
+    for old in keep:
+        row = dict()
+        for terminal, value in table.action_table[old].items():
+            row[terminal] = 's' + str(ids[int(value[1:])]) if value != 0 and value[0] == 's' else value
+        action_table.append(row)
+        goto_table.append({n_terminal: ids[value] if value != 0 else 0
+                           for n_terminal, value in table.goto_table[old].items()})
+    table.action_table[:] = action_table
+    table.goto_table[:] = goto_table
+    renumbered = {(ids[state_id], n_terminal): chain for (state_id, n_terminal), chain in chains.items()}
+    chains.clear()
+    chains.update(renumbered)
+
+
+def reachableStates(table: analyzeTable.AnalyzeTable = None) -> list:
+    table = table or analyzeTable.default
+    res = [0]
+    seen = {0}
+    for state_id in res:
+        targets = [int(value[1:]) for value in table.action_table[state_id].values()
+                   if value != 0 and value[0] == 's']
+        targets += [value for value in table.goto_table[state_id].values() if value != 0]
+        for target in targets:
+            if target not in seen:
+                seen.add(target)
+                res.append(target)
+    return sorted(res)
+
+
+def eliminateUnitReductions(elimination: Elimination = None) -> None:
+    """
+    rewrite the tables of elimination.encoded.table so no unit production rule is reduced, then drop the states that
+    can no longer be entered, call lrParser.encodeTables() on elimination.encoded again afterwards
+    the parse is the same except for the missing unit reductions, chains tells which ones every goto skipped
+    """
+    elimination = elimination or default
+    table = elimination.encoded.table
+    grammar = table.state_set.grammar
+    chains = elimination.chains
+    statistics = elimination.statistics
+    chains.clear()
+    statistics.clear()
+    states = len(table.action_table)
+    units = dict()  # state id -> unit production rule id
+    for state_id in range(states):
+        production_rule_id = unitReduction(state_id, table)
+        if production_rule_id is not None:
+            units[state_id] = production_rule_id
+
+    original = [dict(row) for row in table.goto_table]
+    rewritten = 0
+    for state_id in range(states):
+        for n_terminal, target in original[state_id].items():
+            if target not in units:
+                continue
+            new_target, chain = bypass(state_id, n_terminal, units, original, grammar)
+            if len(chain) == 0:
+                continue
+            table.goto_table[state_id][n_terminal] = new_target
+            chains[(state_id, n_terminal)] = tuple(chain)
+            rewritten += 1
+
+    keep = reachableStates(table)
+    renumber(keep, elimination)
+    statistics['unit production rules'] = sum(1 for production_rule in grammar.production_rule_list
+                                              if unitRule(production_rule, grammar))
+    statistics['gotos rewritten'] = rewritten
+    statistics['states'] = states
+    statistics['states removed'] = states - len(keep)
+
+
+def parse(tokens: list, elimination: Elimination = None) -> list:
+    """
+    lrParser.parse() over tables passed through eliminateUnitReductions(), call lrParser.encodeTables() first
+    the bypassed unit production rules are reported again, so the result is the same as with the original tables
+    """
+    elimination = elimination or default
+    encoded = elimination.encoded
+    action_ = encoded.action
+    goto_ = encoded.goto
+    length_ = encoded.production_length
+    left_ = encoded.production_left
+    width = len(encoded.terminal_ids)
+    goto_width = len(encoded.n_terminal_ids)
+    end = encoded.terminal_ids[data.END]
+    # (state id, nonterminal id) -> chain, lrParser numbers the nonterminals
+    chains_ = {(state_id, encoded.n_terminal_ids[n_terminal]): chain
+               for (state_id, n_terminal), chain in elimination.chains.items()}
+
+    reductions = []
+    stack = [0]
+    n = len(tokens)
+    i = 0
+    token = tokens[0] if n > 0 else end
+    while True:
+        value = action_[stack[-1] * width + token]
+        kind = value & 3
+        if kind == lrParser.SHIFT:
+            stack.append(value >> 2)
+            i += 1
+            token = tokens[i] if i < n else end
+        elif kind == lrParser.REDUCE:
+            production_rule_id = value >> 2
+            length = length_[production_rule_id]
+            if length:
+                del stack[-length:]
+            reductions.append(production_rule_id)
+            chain = chains_.get((stack[-1], left_[production_rule_id]))
+            if chain is not None:
+                reductions.extend(chain)
+            stack.append(goto_[stack[-1] * goto_width + left_[production_rule_id]])
+        elif kind == lrParser.ACCEPT:
+            return reductions
+        else:
+            raise SyntaxError('unexpected token %d at position %d in state %d' % (token, i, stack[-1]))
+
+
+if __name__ == '__main__':
+    data.readData()
+    if 'lalr' in sys.argv[1:]:
+        lalrStateSet.generateLALRStateSet()
+    else:
+        lrStateSet.generateLRStateSet()
+    analyzeTable.generateAnalyzeTable()
+    lrParser.encodeTables()
+    tokens = lrParser.tokenIds(lrParser.sampleProgram(1000))
+    expected = lrParser.parse(tokens)
+
+    eliminateUnitReductions()
+    lrParser.encodeTables()
+    reductions = lrParser.parse(tokens)
+    assert parse(tokens) == expected
+    for k in default.statistics:
+        print('%s: %s' % (k, default.statistics[k]))
+    print('tokens: %d  reductions: %d -> %d  saved per token: %.3f' % (
+        len(tokens), len(expected), len(reductions), (len(expected) - len(reductions)) / len(tokens)))